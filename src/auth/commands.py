@@ -0,0 +1,117 @@
+"""Maintenance commands for auth, e.g. `python -m src.auth.commands calibrate-hashing --target-ms 250`."""
+import argparse
+import asyncio
+import time
+
+from jose import jwt, JWTError
+from sqlalchemy import delete, select, tuple_
+
+from src.auth.config import ALGORITHM, BCRYPT_ROUNDS, REFRESH_TOKEN_EXPIRE_DAYS
+from src.auth.hashing import calibrate_bcrypt_rounds
+from src.auth.models import TokenBlacklist
+from src.auth.revocation import is_token_revoked, revoke_token
+from src.bookings.models import Booking
+from src.config import SECRET_KEY
+from src.database import async_session
+from src.tours.models import Tour
+
+
+def _calibrate_hashing(target_ms: float, min_rounds: int, max_rounds: int):
+    rounds, timings = calibrate_bcrypt_rounds(target_ms, min_rounds=min_rounds, max_rounds=max_rounds)
+    for tried_rounds, duration_ms in timings.items():
+        print(f"rounds={tried_rounds}: {duration_ms:.1f} ms per verify")
+    print(f"Current BCRYPT_ROUNDS={BCRYPT_ROUNDS}")
+    print(f"Recommended for a {target_ms:g} ms target: BCRYPT_ROUNDS={rounds}")
+
+
+def _read_claims(token: str):
+    """Claims of a token we issued, even if expired; None if it does not verify at all."""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        return None
+
+
+def _revoked_until(claims: dict) -> float:
+    """When a logout must stop being enforced: the refresh token issued with the same jti outlives the access token."""
+    if "iat" not in claims:
+        return claims["exp"]
+    return max(claims["exp"], claims["iat"] + REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+
+
+async def _iter_blacklist(batch_size: int):
+    """Yield token_blacklist rows in primary key order, one batch per transaction."""
+    last_key = None
+    while True:
+        async with async_session() as session:
+            query = select(TokenBlacklist).order_by(TokenBlacklist.id, TokenBlacklist.token).limit(batch_size)
+            if last_key is not None:
+                query = query.where(tuple_(TokenBlacklist.id, TokenBlacklist.token) > tuple_(*last_key))
+            entries = (await session.execute(query)).scalars().all()
+        if not entries:
+            return
+        yield entries
+        last_key = (entries[-1].id, entries[-1].token)
+
+
+async def _migrate_token_blacklist(batch_size: int):
+    migrated = skipped = 0
+    async for entries in _iter_blacklist(batch_size):
+        for entry in entries:
+            claims = _read_claims(entry.token)
+            if claims is None or _revoked_until(claims) <= time.time():
+                skipped += 1
+                continue
+            await revoke_token(claims["jti"], expires_at=_revoked_until(claims))
+            migrated += 1
+        print(f"migrated={migrated} skipped_expired={skipped}")
+
+
+async def _purge_token_blacklist(batch_size: int):
+    purged = kept = 0
+    async for entries in _iter_blacklist(batch_size):
+        stale = []
+        for entry in entries:
+            claims = _read_claims(entry.token)
+            # Rows can go once the token is dead anyway or Redis already enforces the revocation
+            if claims is None or _revoked_until(claims) <= time.time() or await is_token_revoked(claims["jti"]):
+                stale.append((entry.id, entry.token))
+            else:
+                kept += 1
+        if stale:
+            async with async_session() as session:
+                await session.execute(
+                    delete(TokenBlacklist).where(tuple_(TokenBlacklist.id, TokenBlacklist.token).in_(stale))
+                )
+                await session.commit()
+            purged += len(stale)
+        print(f"purged={purged} kept={kept}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate = commands.add_parser("calibrate-hashing", help="Pick a bcrypt cost for a target verify latency")
+    calibrate.add_argument("--target-ms", type=float, default=250)
+    calibrate.add_argument("--min-rounds", type=int, default=10)
+    calibrate.add_argument("--max-rounds", type=int, default=16)
+    migrate = commands.add_parser(
+        "migrate-token-blacklist", help="Copy still-valid token_blacklist entries into the Redis revocation store"
+    )
+    migrate.add_argument("--batch-size", type=int, default=1000)
+    purge = commands.add_parser(
+        "purge-token-blacklist", help="Delete token_blacklist rows that are expired or already revoked in Redis"
+    )
+    purge.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.command == "calibrate-hashing":
+        _calibrate_hashing(args.target_ms, args.min_rounds, args.max_rounds)
+    elif args.command == "migrate-token-blacklist":
+        asyncio.run(_migrate_token_blacklist(args.batch_size))
+    elif args.command == "purge-token-blacklist":
+        asyncio.run(_purge_token_blacklist(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,4 +6,19 @@ load_dotenv()
 
 ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES: int = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 120)
-REFRESH_TOKEN_EXPIRE_DAYS: int = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30)
\ No newline at end of file
+REFRESH_TOKEN_EXPIRE_DAYS: int = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30)
+
+# Resolved users kept per worker, keyed by token jti
+PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10_000))
+PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+
+# In-process Bloom filter answering "not revoked" without a Redis round trip
+REVOCATION_BLOOM_FILTER: bool = os.getenv("REVOCATION_BLOOM_FILTER", "0") == "1"
+REVOCATION_BLOOM_CAPACITY: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", 100_000))
+REVOCATION_BLOOM_ERROR_RATE: float = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", 0.01))
+
+# Work factor picked with `make calibrate-hashing`; stored hashes with any other cost are rehashed on login
+BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASHING_EXECUTOR: str = os.getenv("HASHING_EXECUTOR", "thread")  # thread or process
+HASHING_MAX_WORKERS: int = int(os.getenv("HASHING_MAX_WORKERS", min(4, os.cpu_count() or 1)))
+HASHING_MAX_PENDING: int = int(os.getenv("HASHING_MAX_PENDING", 64))
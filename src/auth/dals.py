@@ -5,6 +5,8 @@ from sqlalchemy import and_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.models import User
+from src.auth.principals import invalidate_user_principals
+from src.cache import bump_generation
 from src.exceptions import UserAlreadyExistsException
 
 
@@ -48,6 +50,9 @@ class UserDAL:
         res = await self.db_session.execute(query)
         deleted_user_id_row = res.fetchone()
         if deleted_user_id_row is not None:
+            # Only once committed, or a concurrent request could re-cache the user from the old row
+            await self.db_session.commit()
+            await invalidate_user_principals(user_id)
             return deleted_user_id_row[0]
 
     async def get_user_by_id(self, user_id: UUID) -> Union[User, None]:
@@ -81,10 +86,15 @@ class UserDAL:
         res = await self.db_session.execute(query)
         update_user_id_row = res.fetchone()
         if update_user_id_row is not None:
+            await self.db_session.commit()
+            await invalidate_user_principals(user_id)
+            # Bookings read with expand=client embed the user
+            await bump_generation("bookings")
             return update_user_id_row[0]
 
     async def update_password(self, user: User, new_hashed_password: str):
         user.hashed_password = new_hashed_password
         self.db_session.add(user)
         await self.db_session.commit()
+        await invalidate_user_principals(user.user_id)
         return user
\ No newline at end of file
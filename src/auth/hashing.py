@@ -1,6 +1,24 @@
+import asyncio
+import statistics
+import time
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+from src.auth.config import BCRYPT_ROUNDS, HASHING_EXECUTOR, HASHING_MAX_PENDING, HASHING_MAX_WORKERS
+from src.exceptions import ServiceBusyException
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+bcrypt_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    # Pinning both bounds makes needs_update() flag hashes made with any other cost
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 
 class Hasher:
@@ -10,4 +28,120 @@ class Hasher:
 
     @staticmethod
     def get_password_hash(password: str) -> str:
-        return bcrypt_context.hash(password)
\ No newline at end of file
+        return bcrypt_context.hash(password)
+
+    @staticmethod
+    def needs_update(hashed_password: str) -> bool:
+        return bcrypt_context.needs_update(hashed_password)
+
+
+def calibrate_bcrypt_rounds(
+    target_ms: float,
+    min_rounds: int = 10,
+    max_rounds: int = 16,
+    samples: int = 3,
+) -> Tuple[int, Dict[int, float]]:
+    """Benchmark this host and return the highest bcrypt cost whose verify stays within `target_ms`.
+
+    Never goes below `min_rounds`, even if that already exceeds the target.
+    Also returns the median verify time in milliseconds for every cost tried.
+    """
+    chosen = min_rounds
+    timings = {}
+    for rounds in range(min_rounds, max_rounds + 1):
+        hashed_password = bcrypt.using(rounds=rounds).hash("calibration")
+        durations = []
+        for _ in range(samples):
+            started_at = time.perf_counter()
+            bcrypt.verify("calibration", hashed_password)
+            durations.append(time.perf_counter() - started_at)
+        timings[rounds] = statistics.median(durations) * 1000
+        if timings[rounds] > target_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+def _timed_call(func, submitted_at: float, *args):
+    """Runs inside the worker; reports how long the job queued and ran."""
+    started_at = time.monotonic()
+    result = func(*args)
+    return result, started_at - submitted_at, time.monotonic() - started_at
+
+
+class HashingService:
+    """Runs the blocking `Hasher` calls in a bounded worker pool, off the event loop.
+
+    At most `max_pending` jobs may be queued or running at once; beyond that
+    new work is rejected with a 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, use_processes: bool = False):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._run_time_total = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.max_workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise ServiceBusyException()
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, queue_time, run_time = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, time.monotonic(), *args
+            )
+        finally:
+            self._pending -= 1
+
+        self._completed += 1
+        self._queue_time_total += queue_time
+        self._queue_time_max = max(self._queue_time_max, queue_time)
+        self._run_time_total += run_time
+        return result
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(Hasher.verify_password, plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str) -> str:
+        return await self._run(Hasher.get_password_hash, password)
+
+    def stats(self) -> dict:
+        completed = self._completed or 1
+        return {
+            "executor": "process" if self.use_processes else "thread",
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_queue_time_ms": round(self._queue_time_total / completed * 1000, 3),
+            "max_queue_time_ms": round(self._queue_time_max * 1000, 3),
+            "avg_run_time_ms": round(self._run_time_total / completed * 1000, 3),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_service = HashingService(
+    max_workers=HASHING_MAX_WORKERS,
+    max_pending=HASHING_MAX_PENDING,
+    use_processes=HASHING_EXECUTOR == "process",
+)
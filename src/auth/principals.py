@@ -0,0 +1,39 @@
+from uuid import UUID
+
+from src.auth.config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+from src.cache import TTLCache, publish_invalidation, register_invalidation_handler, register_subscription_handler
+
+
+# Detached User instances resolved by get_current_user, keyed by token jti
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+TOKEN_NAMESPACE = "principal_token"
+USER_NAMESPACE = "principal_user"
+
+
+def _drop_token(jti: str):
+    principal_cache.pop(jti)
+
+
+def _drop_user(user_id: str):
+    principal_cache.pop_where(lambda jti, user: str(user.user_id) == user_id)
+
+
+async def _drop_all():
+    principal_cache.clear()
+
+
+register_invalidation_handler(TOKEN_NAMESPACE, _drop_token)
+register_invalidation_handler(USER_NAMESPACE, _drop_user)
+# Invalidations sent while we were not subscribed are lost, so start over
+register_subscription_handler(_drop_all)
+
+
+async def invalidate_token_principal(jti: str):
+    """Forget the user resolved for one token in every worker."""
+    await publish_invalidation(TOKEN_NAMESPACE, jti)
+
+
+async def invalidate_user_principals(user_id: UUID):
+    """Forget every cached token of a user in every worker."""
+    await publish_invalidation(USER_NAMESPACE, str(user_id))
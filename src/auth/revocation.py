@@ -0,0 +1,70 @@
+import hashlib
+import math
+import time
+
+from src.auth.config import REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE, REVOCATION_BLOOM_FILTER
+from src.cache import publish_invalidation, register_invalidation_handler, register_subscription_handler
+from src.database import redis_client
+
+
+REVOKED_TOKEN_PREFIX = "revoked_token:"
+REVOCATION_NAMESPACE = "revoked_token"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter: `in` may give false positives, never false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big")
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+# Only trusted once it has been loaded from Redis while subscribed to new revocations;
+# until then (and in processes without the listener) every lookup goes to Redis.
+_bloom_filter = None
+
+
+def _remember_revoked(jti: str):
+    if _bloom_filter is not None:
+        _bloom_filter.add(jti)
+
+
+async def _load_bloom_filter():
+    global _bloom_filter
+    bloom_filter = BloomFilter(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE)
+    async for key in redis_client.scan_iter(match=f"{REVOKED_TOKEN_PREFIX}*", count=1000):
+        bloom_filter.add(key[len(REVOKED_TOKEN_PREFIX):])
+    _bloom_filter = bloom_filter
+
+
+if REVOCATION_BLOOM_FILTER:
+    register_invalidation_handler(REVOCATION_NAMESPACE, _remember_revoked)
+    register_subscription_handler(_load_bloom_filter)
+
+
+async def revoke_token(jti: str, expires_at: int):
+    """Revoke every token carrying `jti` until `expires_at` (a unix timestamp), when it would expire anyway."""
+    ttl = int(expires_at - time.time())
+    if ttl <= 0:
+        return
+    await redis_client.set(f"{REVOKED_TOKEN_PREFIX}{jti}", 1, ex=ttl)
+    await publish_invalidation(REVOCATION_NAMESPACE, jti)
+
+
+async def is_token_revoked(jti: str) -> bool:
+    if _bloom_filter is not None and jti not in _bloom_filter:
+        return False
+    return bool(await redis_client.exists(f"{REVOKED_TOKEN_PREFIX}{jti}"))
@@ -42,16 +42,13 @@ async def login_for_access_token(
 async def refresh_token(refresh: Annotated[str, None] = None):
     if not refresh:
         raise BadRequestException(detail="refresh token required")
-    return refresh_token_state(token=refresh)
+    return await refresh_token_state(token=refresh)
 
 
 @auth_router.post("/logout", status_code=status.HTTP_200_OK)
-async def logout(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: AsyncSession = Depends(get_db),
-):
-    await decode_access_token(token=token, db=db)
-    await logout_func(token=token, db=db)
+async def logout(token: Annotated[str, Depends(oauth2_scheme)]):
+    await decode_access_token(token=token)
+    await logout_func(token=token)
 
     return {"msg": "Succesfully logout"}
 
@@ -1,4 +1,5 @@
 from jose import jwt, JWTError
+import time
 import uuid
 
 from typing import Annotated, Union, Optional
@@ -8,13 +9,15 @@ from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.dals import UserDAL
-from src.auth.models import User, TokenBlacklist
-from src.auth.hashing import Hasher
+from src.auth.models import User
+from src.auth.hashing import Hasher, hashing_service
+from src.auth.principals import invalidate_token_principal, principal_cache
+from src.auth.revocation import is_token_revoked, revoke_token
 
 from .schemas import ShowUser, UserCreate, TokenPair, ChangePassword
 from src.auth.config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS
 from src.config import SECRET_KEY
-from src.database import get_db
+from src.database import get_db, primary_session
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, OAuth2PasswordBearer
 from src.exceptions import AuthFailedException
 
@@ -27,12 +30,14 @@ JTI = "jti"
 
 
 async def _create_new_user(body: UserCreate, session) -> ShowUser:
+    # Hash before opening the transaction so no connection is held while bcrypt runs
+    hashed_password = await hashing_service.get_password_hash(body.password)
     async with session.begin():
         user_dal = UserDAL(session)
         user = await user_dal.create_user(
             user_name=body.user_name,
             email=body.email,
-            hashed_password=Hasher.get_password_hash(body.password),
+            hashed_password=hashed_password,
         )
         return ShowUser(
             user_id=user.user_id,
@@ -51,18 +56,19 @@ async def _get_user_by_email_for_auth(email: str, session: AsyncSession):
 
 
 async def _update_user_password(user: User, body: ChangePassword, session: AsyncSession) -> ShowUser:
+    new_hashed_password = await hashing_service.get_password_hash(body.new_password)
     if not session.in_transaction():
         async with session.begin():
             user_dal = UserDAL(session)
             return await user_dal.update_password(
                 user=user,
-                new_hashed_password=Hasher.get_password_hash(body.new_password)
+                new_hashed_password=new_hashed_password
             )
     else:
         user_dal = UserDAL(session)
         return await user_dal.update_password(
             user=user,
-            new_hashed_password=Hasher.get_password_hash(body.new_password)
+            new_hashed_password=new_hashed_password
         )
 
 
@@ -71,8 +77,11 @@ async def authenticate_user(db: AsyncSession, username: str, password: str):
     user = await user_dal.get_user_by_username(username)
     if not user:
         return False
-    if not Hasher.verify_password(password, user.hashed_password):
+    if not await hashing_service.verify_password(password, user.hashed_password):
         return False
+    if Hasher.needs_update(user.hashed_password):
+        # The password is known only now, so this is the one chance to move it to the current cost
+        await user_dal.update_password(user, await hashing_service.get_password_hash(password))
     return user
 
 
@@ -113,23 +122,26 @@ def create_token_pair(user: User) -> TokenPair:
     )
 
 
-async def decode_access_token(token: str, db: AsyncSession):
+def _decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        black_list_token = await TokenBlacklist.find_by_id(db=db, id=payload[JTI])
-        if black_list_token:
-            raise JWTError("Token is blacklisted")
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise AuthFailedException()
 
+
+async def _ensure_not_revoked(payload: dict):
+    if await is_token_revoked(payload[JTI]):
+        raise AuthFailedException()
+
+
+async def decode_access_token(token: str):
+    payload = _decode_token(token)
+    await _ensure_not_revoked(payload)
     return payload
 
 
-def refresh_token_state(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except JWTError as ex:
-        raise AuthFailedException()
+async def refresh_token_state(token: str):
+    payload = await decode_access_token(token)
 
     return TokenPair(
         access=create_access_token(data={**payload}),
@@ -137,18 +149,29 @@ def refresh_token_state(token: str):
     )
 
 
-async def logout_func(token: str, db: AsyncSession):
-    blacklisted_token = TokenBlacklist(token=token)
-    db.add(blacklisted_token)
-    await db.commit()
+async def logout_func(token: str):
+    payload = _decode_token(token)
+    # The refresh tokens share the jti and outlive the access token, so revoke for as long as any of them is valid
+    refresh_expires_at = time.time() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds()
+    await revoke_token(payload[JTI], expires_at=max(payload[EXP], refresh_expires_at))
+    await invalidate_token_principal(payload[JTI])
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
-    token_data = await decode_access_token(token, db=db)
-    if token_data is None:
-        raise AuthFailedException()
-    user_dal = UserDAL(db)
-    user = await user_dal.get_user_by_id(uuid.UUID(token_data[SUB]))
-    if user is None:
-        raise AuthFailedException()
+    # The signature and expiry are always checked; only the database lookups are cached
+    token_data = _decode_token(token)
+    user = principal_cache.get(token_data[JTI])
+    if user is not None:
+        return user
+
+    await _ensure_not_revoked(token_data)
+    # On a session of its own, closed right after the lookup, so the connection goes back to the pool before
+    # the route needs one; on the primary, as the principal is cached for later requests
+    async with primary_session(db) as session:
+        user = await UserDAL(session).get_user_by_id(uuid.UUID(token_data[SUB]))
+        if user is None or not user.is_active:
+            raise AuthFailedException()
+        # Detach it, so closing the session cannot expire the cached copy
+        session.expunge(user)
+    principal_cache.set(token_data[JTI], user)
     return user
\ No newline at end of file
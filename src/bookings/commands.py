@@ -0,0 +1,102 @@
+"""Maintenance commands for bookings, e.g. `python -m src.bookings.commands reconcile-seat-holds`."""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete
+
+from src.auth.models import User
+from src.bookings.holds import reconcile_seat_counts
+from src.bookings.models import Booking
+from src.bookings.repo import BookingRepository
+from src.database import async_session
+from src.exceptions import NotEnoughSeatsException
+from src.tours.inventory import get_availability
+from src.tours.models import Tour
+
+
+async def _book(tour_id: uuid.UUID, client_id: uuid.UUID, seats: int):
+    started_at = time.perf_counter()
+    async with async_session() as session:
+        try:
+            await BookingRepository(session).create_booking({"tour_id": tour_id, "client_id": client_id, "seats": seats})
+            booked = True
+        except NotEnoughSeatsException:
+            booked = False
+    return booked, time.perf_counter() - started_at
+
+
+async def _benchmark_seats(capacity: int, requests: int, concurrency: int, seats: int):
+    """Race `requests` bookings for one tour of `capacity` seats and check nothing was oversold."""
+    suffix = uuid.uuid4().hex[:12]
+    async with async_session() as session:
+        client = User(user_name=f"seat-benchmark-{suffix}", email=f"seat-benchmark-{suffix}@example.com",
+                      hashed_password="!")
+        tour = Tour(destination="Seat benchmark", duration=1, cost=0, transport="-", hotel="-",
+                    capacity=capacity, seats_left=capacity)
+        session.add_all([client, tour])
+        await session.commit()
+        tour_id, client_id = tour.tour_id, client.user_id
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def book():
+        async with limit:
+            return await _book(tour_id, client_id, seats)
+
+    try:
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*(book() for _ in range(requests)))
+        elapsed = time.perf_counter() - started_at
+
+        async with async_session() as session:
+            _, seats_left = await get_availability(session, tour_id)
+    finally:
+        async with async_session() as session:
+            await session.execute(delete(Booking).where(Booking.tour_id == tour_id))
+            await session.execute(delete(Tour).where(Tour.tour_id == tour_id))
+            await session.execute(delete(User).where(User.user_id == client_id))
+            await session.commit()
+
+    booked = sum(1 for ok, _ in results if ok)
+    latencies = sorted(duration * 1000 for _, duration in results)
+    print(f"requests={requests} concurrency={concurrency} seats_per_booking={seats} capacity={capacity}")
+    print(f"throughput: {requests / elapsed:.1f} bookings/s over {elapsed:.2f} s")
+    print(f"latency: p50={statistics.median(latencies):.1f} ms "
+          f"p99={latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f} ms")
+    print(f"booked={booked} refused={requests - booked} seats_left={seats_left}")
+    expected = min(requests, capacity // seats)
+    if booked != expected or seats_left != capacity - booked * seats:
+        raise SystemExit(f"Inventory mismatch: expected {expected} bookings and "
+                         f"{capacity - expected * seats} seats left")
+
+
+async def _reconcile_seat_holds():
+    async with async_session() as session:
+        report = await reconcile_seat_counts(session)
+    print(f"tours={report['tours']} repaired={report['repaired']} removed={report['removed']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "reconcile-seat-holds", help="Recompute the seat counts behind holds in Redis from Postgres and repair drift"
+    )
+    benchmark = commands.add_parser("benchmark-seats", help="Race concurrent bookings for one tour and check for oversell")
+    benchmark.add_argument("--capacity", type=int, default=100)
+    benchmark.add_argument("--requests", type=int, default=500)
+    benchmark.add_argument("--concurrency", type=int, default=50, help="Bookings in flight at once")
+    benchmark.add_argument("--seats", type=int, default=1, help="Seats taken by each booking")
+
+    args = parser.parse_args()
+    if args.command == "reconcile-seat-holds":
+        asyncio.run(_reconcile_seat_holds())
+    elif args.command == "benchmark-seats":
+        asyncio.run(_benchmark_seats(args.capacity, args.requests, args.concurrency, args.seats))
+
+
+if __name__ == "__main__":
+    main()
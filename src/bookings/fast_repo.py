@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import driver_connection
+
+
+# The columns `serialize_booking` reads, in the order `_serialize` unpacks them
+BOOKING_COLUMNS = "booking_id, client_id, tour_id, status, seats, booking_date"
+
+
+def _serialize(record) -> dict:
+    booking_id, client_id, tour_id, status, seats, booking_date = record
+    return {
+        "booking_id": str(booking_id),
+        "client_id": str(client_id),
+        "tour_id": str(tour_id),
+        "status": status,
+        "seats": seats,
+        "booking_date": booking_date.isoformat() if booking_date is not None else None,
+    }
+
+
+class BookingFastRepository:
+    """Read-only `BookingRepository` queries run as prepared statements directly on asyncpg.
+
+    Rows are mapped straight into the dicts `serialize_booking` would build
+    without `expand`, skipping ORM hydration.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_booking_by_id(self, booking_id: UUID) -> Optional[dict]:
+        connection = await driver_connection(self.db)
+        record = await connection.fetchrow(
+            f"SELECT {BOOKING_COLUMNS} FROM bookings WHERE booking_id = $1::uuid", booking_id
+        )
+        return _serialize(record) if record is not None else None
+
+    async def get_bookings_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        client_id: Optional[UUID] = None,
+        tour_id: Optional[UUID] = None,
+    ) -> Tuple[List[dict], bool]:
+        """Same page as `BookingRepository.get_bookings_page`, as serialized bookings."""
+        conditions, args = [], []
+        if client_id is not None:
+            args.append(client_id)
+            conditions.append(f"client_id = ${len(args)}::uuid")
+        if tour_id is not None:
+            args.append(tour_id)
+            conditions.append(f"tour_id = ${len(args)}::uuid")
+        if after is not None:
+            args.extend(after)
+            conditions.append(f"(booking_date, booking_id) < (${len(args) - 1}::timestamp, ${len(args)}::uuid)")
+
+        args.append(limit + 1)
+        query = (
+            f"SELECT {BOOKING_COLUMNS} FROM bookings"
+            + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+            + f" ORDER BY booking_date DESC, booking_id DESC LIMIT ${len(args)}::integer"
+        )
+        connection = await driver_connection(self.db)
+        records = await connection.fetch(query, *args)
+        return [_serialize(record) for record in records[:limit]], len(records) > limit
@@ -0,0 +1,350 @@
+"""Short-lived seat holds kept in Redis, so a checkout can keep seats in its cart without locking Postgres.
+
+Per tour, `seat_count:<tour_id>` is the number of seats still free to hold:
+the tour's `seats_left` in Postgres minus the seats of its live holds (or
+"unlimited" for a tour without a capacity). `seat_holds:<tour_id>` lists the
+live holds by expiry time, and `seat_hold:<hold_id>` describes one of them.
+Every change goes through a Lua script, so concurrent holds can never take
+more seats than there are. Only a confirmed hold becomes a `Booking`, which
+still takes its seats from Postgres with the usual conditional UPDATE.
+Bookings made without a hold take their seats from the count first too
+(`take_seats`), so they cannot sell seats someone is holding.
+"""
+import uuid
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import SEAT_HOLD_TTL
+from src.database import redis_client
+from src.exceptions import NotEnoughSeatsException
+from src.tours.inventory import get_availability
+
+
+SEAT_COUNT_PREFIX = "seat_count:"
+SEAT_HOLDS_PREFIX = "seat_holds:"
+SEAT_HOLD_PREFIX = "seat_hold:"
+UNLIMITED = "unlimited"
+
+# Expired holds are given back lazily, by whichever script touches their tour next. The count and
+# the hold list always expire together, a hold TTL after the last hold, so a tour nobody holds
+# seats on any more starts over from Postgres.
+_LUA_HELPERS = """
+local function now_ms()
+    local time = redis.call('TIME')
+    return tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+
+local function give_back(count_key, seats)
+    local available = redis.call('GET', count_key)
+    if available and available ~= 'unlimited' and seats > 0 then
+        redis.call('INCRBY', count_key, seats)
+    end
+end
+
+local function expire_holds(count_key, holds_key, now)
+    local expired = redis.call('ZRANGEBYSCORE', holds_key, '-inf', now)
+    local seats = 0
+    for _, member in ipairs(expired) do
+        seats = seats + tonumber(string.match(member, ':(%d+)$'))
+    end
+    if #expired > 0 then
+        redis.call('ZREMRANGEBYSCORE', holds_key, '-inf', now)
+        give_back(count_key, seats)
+    end
+    return #expired
+end
+
+local function keep_until(key, expire_at, now)
+    local ttl = redis.call('PTTL', key)
+    if ttl < 0 or now + ttl < expire_at then
+        redis.call('PEXPIREAT', key, expire_at)
+    end
+end
+
+local function set_count(count_key, holds_key, available, now, ttl)
+    local held = 0
+    for _, member in ipairs(redis.call('ZRANGE', holds_key, 0, -1)) do
+        held = held + tonumber(string.match(member, ':(%d+)$'))
+    end
+    if available ~= 'unlimited' then
+        available = tonumber(available) - held
+    end
+    redis.call('SET', count_key, available)
+    local last = redis.call('ZRANGE', holds_key, -1, -1, 'WITHSCORES')
+    local expire_at = math.max(tonumber(last[2] or now), now) + ttl
+    redis.call('PEXPIREAT', count_key, expire_at)
+    if last[1] then
+        redis.call('PEXPIREAT', holds_key, expire_at)
+    end
+    return available
+end
+"""
+
+# KEYS: count, holds, hold. ARGV: hold_id, seats, ttl_ms, client_id, tour_id.
+# Returns the hold's expiry in ms, 0 if there are not enough seats, -1 if the count must be loaded first.
+_HOLD = redis_client.register_script(_LUA_HELPERS + """
+local now = now_ms()
+expire_holds(KEYS[1], KEYS[2], now)
+local available = redis.call('GET', KEYS[1])
+if not available then
+    return -1
+end
+local seats = tonumber(ARGV[2])
+if available ~= 'unlimited' then
+    if tonumber(available) < seats then
+        return 0
+    end
+    redis.call('DECRBY', KEYS[1], seats)
+end
+local ttl = tonumber(ARGV[3])
+local expires_at = now + ttl
+redis.call('ZADD', KEYS[2], expires_at, ARGV[1] .. ':' .. ARGV[2])
+redis.call('HSET', KEYS[3], 'tour_id', ARGV[5], 'client_id', ARGV[4], 'seats', ARGV[2], 'expires_at', expires_at)
+redis.call('PEXPIREAT', KEYS[3], expires_at)
+keep_until(KEYS[1], expires_at + ttl, now)
+keep_until(KEYS[2], expires_at + ttl, now)
+return expires_at
+""")
+
+# KEYS: count, holds. ARGV: seats_left or 'unlimited', ttl_ms, '1' to overwrite an existing count.
+# Returns {previous count or false, new count}.
+_LOAD_COUNT = redis_client.register_script(_LUA_HELPERS + """
+local now = now_ms()
+expire_holds(KEYS[1], KEYS[2], now)
+local previous = redis.call('GET', KEYS[1])
+if previous and ARGV[3] ~= '1' then
+    return {previous, previous}
+end
+return {previous, set_count(KEYS[1], KEYS[2], ARGV[1], now, tonumber(ARGV[2]))}
+""")
+
+# KEYS: count, holds, hold. ARGV: hold_id, client_id, '1' to give the seats back to the count.
+# Returns the seats of the removed hold, or 0 if the client has no such live hold.
+_REMOVE_HOLD = redis_client.register_script(_LUA_HELPERS + """
+local now = now_ms()
+expire_holds(KEYS[1], KEYS[2], now)
+local hold = redis.call('HMGET', KEYS[3], 'client_id', 'seats', 'expires_at')
+if hold[1] ~= ARGV[2] or tonumber(hold[3]) <= now then
+    return 0
+end
+local seats = tonumber(hold[2])
+redis.call('ZREM', KEYS[2], ARGV[1] .. ':' .. hold[2])
+redis.call('DEL', KEYS[3])
+if ARGV[3] == '1' then
+    give_back(KEYS[1], seats)
+end
+return seats
+""")
+
+# KEYS: one count per tour. ARGV: seats taken (or given back, if negative) per tour, in the same order.
+_ADJUST_COUNTS = redis_client.register_script("""
+for index, count_key in ipairs(KEYS) do
+    local available = redis.call('GET', count_key)
+    if available and available ~= 'unlimited' then
+        redis.call('DECRBY', count_key, ARGV[index])
+    end
+end
+""")
+
+
+# KEYS: count and holds per tour. ARGV: ttl_ms, then per item the seats it takes (or gives back, if negative)
+# as "<tour position in KEYS>:<seats>,...". Items are admitted in order, only if all their seats fit;
+# seats given back count towards later items but are only mirrored onto the counts after the commit.
+# Returns {positions of tours whose count must be loaded first, 1 or 0 per item}.
+_TAKE_SEATS = redis_client.register_script(_LUA_HELPERS + """
+local now = now_ms()
+local available, taken, missing = {}, {}, {}
+for tour = 1, #KEYS / 2 do
+    expire_holds(KEYS[2 * tour - 1], KEYS[2 * tour], now)
+    local count = redis.call('GET', KEYS[2 * tour - 1])
+    if not count then
+        table.insert(missing, tour)
+    elseif count ~= 'unlimited' then
+        available[tour] = tonumber(count)
+        taken[tour] = 0
+    end
+end
+if #missing > 0 then
+    return {missing, {}}
+end
+local admitted = {}
+for item = 2, #ARGV do
+    local fits = 1
+    for tour, seats in string.gmatch(ARGV[item], '(%d+):(-?%d+)') do
+        tour, seats = tonumber(tour), tonumber(seats)
+        if available[tour] and seats > available[tour] then
+            fits = 0
+        end
+    end
+    if fits == 1 then
+        for tour, seats in string.gmatch(ARGV[item], '(%d+):(-?%d+)') do
+            tour, seats = tonumber(tour), tonumber(seats)
+            if available[tour] then
+                available[tour] = available[tour] - seats
+                taken[tour] = taken[tour] + math.max(seats, 0)
+            end
+        end
+    end
+    admitted[item - 1] = fits
+end
+for tour, seats in pairs(taken) do
+    if seats > 0 then
+        redis.call('DECRBY', KEYS[2 * tour - 1], seats)
+        keep_until(KEYS[2 * tour - 1], now + tonumber(ARGV[1]), now)
+    end
+end
+return {missing, admitted}
+""")
+
+
+def _keys(tour_id, hold_id=None):
+    keys = [f"{SEAT_COUNT_PREFIX}{tour_id}", f"{SEAT_HOLDS_PREFIX}{tour_id}"]
+    if hold_id is not None:
+        keys.append(f"{SEAT_HOLD_PREFIX}{hold_id}")
+    return keys
+
+
+def _from_ms(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
+
+
+async def _load_count(db: AsyncSession, tour_id: UUID, overwrite: bool = False) -> Optional[list]:
+    availability = await get_availability(db, tour_id)
+    if availability is None:
+        return None
+    _, seats_left = availability
+    return await _LOAD_COUNT(
+        keys=_keys(tour_id),
+        args=[UNLIMITED if seats_left is None else seats_left, SEAT_HOLD_TTL * 1000, int(overwrite)],
+    )
+
+
+async def hold_seats(
+    db: AsyncSession, tour_id: UUID, client_id: UUID, seats: int, ttl: int = SEAT_HOLD_TTL
+) -> Optional[dict]:
+    """Hold `seats` on a tour for `ttl` seconds; None if there is no such tour.
+
+    Postgres is only read when the tour's count is not in Redis yet.
+    """
+    hold_id = uuid.uuid4()
+    for _ in range(2):
+        expires_at = await _HOLD(
+            keys=_keys(tour_id, hold_id), args=[str(hold_id), seats, ttl * 1000, str(client_id), str(tour_id)]
+        )
+        if expires_at > 0:
+            return {"hold_id": hold_id, "tour_id": tour_id, "seats": seats, "expires_at": _from_ms(expires_at)}
+        if expires_at == 0:
+            raise NotEnoughSeatsException()
+        if await _load_count(db, tour_id) is None:
+            return None
+    raise NotEnoughSeatsException()
+
+
+async def _remove_hold(hold_id: UUID, client_id: UUID, give_back: bool) -> Optional[dict]:
+    tour_id = await redis_client.hget(f"{SEAT_HOLD_PREFIX}{hold_id}", "tour_id")
+    if tour_id is None:
+        return None
+    seats = await _REMOVE_HOLD(keys=_keys(tour_id, hold_id), args=[str(hold_id), str(client_id), int(give_back)])
+    if not seats:
+        return None
+    return {"hold_id": hold_id, "tour_id": UUID(tour_id), "seats": seats}
+
+
+async def release_hold(hold_id: UUID, client_id: UUID) -> Optional[dict]:
+    """Drop a client's live hold and put its seats back on sale; None if there is no such hold."""
+    return await _remove_hold(hold_id, client_id, give_back=True)
+
+
+async def claim_hold(hold_id: UUID, client_id: UUID) -> Optional[dict]:
+    """Take a client's live hold out of Redis to book it, keeping its seats off sale; None if there is no such hold.
+
+    The caller must book the seats with `from_hold=True`, or hand them back
+    with `adjust_seat_counts({tour_id: -seats})` if booking fails.
+    """
+    return await _remove_hold(hold_id, client_id, give_back=False)
+
+
+async def adjust_seat_counts(changes: Dict[UUID, int]):
+    """Mirror seats taken (positive) or given back (negative) in Postgres onto the counts in Redis.
+
+    Call after the commit; tours without a count in Redis are left for
+    `hold_seats` to load when needed.
+    """
+    if changes:
+        await _ADJUST_COUNTS(keys=[f"{SEAT_COUNT_PREFIX}{tour_id}" for tour_id in changes], args=list(changes.values()))
+
+
+async def take_seats(db: AsyncSession, changes: List[Dict[UUID, int]]) -> List[bool]:
+    """Take the seats of bookings made without a hold from the counts in Redis, before Postgres; one flag per item.
+
+    `changes` are the seats each item takes (or gives back, if negative) per
+    tour. An item is admitted only if all the seats it takes are free to hold,
+    so holds keep their seats off sale. Seats taken here are only mirrored
+    onto the counts, Postgres still has the final say: hand the seats of items
+    that end up refused or rolled back back with `give_back_seats`, and mirror
+    the seats the committed items give back with `adjust_seat_counts`.
+    """
+    tour_ids = list({tour_id for change in changes for tour_id, seats in change.items() if seats > 0})
+    if not tour_ids:
+        return [True] * len(changes)
+    for _ in range(2):
+        positions = {tour_id: position for position, tour_id in enumerate(tour_ids, start=1)}
+        missing, admitted = await _TAKE_SEATS(
+            keys=[key for tour_id in tour_ids for key in _keys(tour_id)],
+            args=[SEAT_HOLD_TTL * 1000] + [
+                ",".join(f"{positions[tour_id]}:{seats}" for tour_id, seats in change.items() if tour_id in positions)
+                for change in changes
+            ],
+        )
+        if not missing:
+            return [bool(fits) for fits in admitted]
+        # No such tour: there is nothing to take from, and Postgres refuses the item
+        gone = {tour_ids[position - 1] for position in missing
+                if await _load_count(db, tour_ids[position - 1]) is None}
+        tour_ids = [tour_id for tour_id in tour_ids if tour_id not in gone]
+    raise NotEnoughSeatsException()
+
+
+async def give_back_seats(changes: Iterable[Dict[UUID, int]]):
+    """Undo `take_seats` for items that did not make it into Postgres."""
+    total = {}
+    for change in changes:
+        for tour_id, seats in change.items():
+            if seats > 0:
+                total[tour_id] = total.get(tour_id, 0) - seats
+    await adjust_seat_counts(total)
+
+
+async def forget_seat_counts(tour_ids: Iterable[UUID]):
+    """Drop the counts of tours whose inventory was reset in Postgres, e.g. by a capacity change."""
+    keys = [f"{SEAT_COUNT_PREFIX}{tour_id}" for tour_id in tour_ids]
+    if keys:
+        await redis_client.delete(*keys)
+
+
+async def reconcile_seat_counts(db: AsyncSession) -> dict:
+    """Recompute every count in Redis from Postgres and the live holds, and report the ones that had drifted.
+
+    Expired holds are given back on the way. Counts drift when a write lands
+    in Postgres but its mirror in Redis is lost, e.g. when a worker dies in
+    between; run this periodically to repair them.
+    """
+    report = {"tours": 0, "repaired": 0, "removed": 0}
+    tour_ids = set()
+    for prefix in (SEAT_COUNT_PREFIX, SEAT_HOLDS_PREFIX):
+        async for key in redis_client.scan_iter(match=f"{prefix}*", count=1000):
+            tour_ids.add(key[len(prefix):])
+    for tour_id in tour_ids:
+        report["tours"] += 1
+        loaded = await _load_count(db, UUID(tour_id), overwrite=True)
+        if loaded is None:
+            # The tour is gone, and so is everything held on it
+            await redis_client.delete(*_keys(tour_id))
+            report["removed"] += 1
+        elif loaded[0] is not None and str(loaded[0]) != str(loaded[1]):
+            report["repaired"] += 1
+    return report
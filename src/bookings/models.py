@@ -1,6 +1,7 @@
 import uuid
 
-from sqlalchemy import Boolean, Column, DateTime, String, func, select, Date, Float, Integer, ForeignKey
+from sqlalchemy import (Boolean, CheckConstraint, Column, DateTime, String, func, select, Date, Float, Integer,
+                        ForeignKey, Index)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -10,12 +11,19 @@ from src.database import Base
 class Booking(Base):
     """Model representing bookings."""
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Per-client and per-tour listings page newest first by (booking_date, booking_id)
+        Index("ix_bookings_client_id_booking_date_booking_id", "client_id", "booking_date", "booking_id"),
+        Index("ix_bookings_tour_id_booking_date_booking_id", "tour_id", "booking_date", "booking_id"),
+        CheckConstraint("seats > 0", name="ck_bookings_seats_positive"),
+    )
 
     booking_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     client_id = Column(UUID(as_uuid=True), ForeignKey('user.user_id'), nullable=False)
     tour_id = Column(UUID(as_uuid=True), ForeignKey('tours.tour_id'), nullable=False)
     booking_date = Column(DateTime, default=func.now())
     status = Column(String, nullable=False, default="confirmed")  # confirmed, canceled, etc.
+    seats = Column(Integer, nullable=False, default=1, server_default="1")
 
     client = relationship("User", back_populates="bookings")
     tour = relationship("Tour", back_populates="bookings")
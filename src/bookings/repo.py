@@ -1,46 +1,285 @@
+from datetime import datetime
+from itertools import groupby
+from typing import Collection, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload, selectinload
+from src.bookings.holds import adjust_seat_counts, give_back_seats, take_seats
 from src.bookings.models import Booking
+from src.bookings.schemas import BookingBatchItem
+from src.exceptions import NotEnoughSeatsException
+from src.tours.inventory import CANCELED, adjust_seats, seat_changes, seats_held
+from src.tours.models import Tour
 from uuid import UUID
 
 
+# Relationships a read can load along with the bookings, by the name clients ask for them with
+EXPANDABLE = {"tour": Booking.tour, "client": Booking.client}
+
+
+def _expand(query, expand: Collection[str], loader=selectinload):
+    """Eager-load the `expand`ed relationships; `selectinload` costs one more query per relationship per page."""
+    return query.options(*(loader(EXPANDABLE[name]) for name in sorted(expand)))
+
+
 class BookingRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_all_bookings(self):
+    async def get_all_bookings(self, expand: Collection[str] = ()):
         """Retrieve all bookings."""
-        result = await self.db.execute(select(Booking))
+        result = await self.db.execute(_expand(select(Booking), expand))
         return result.scalars().all()
 
-    async def get_booking_by_id(self, booking_id: UUID):
-        """Retrieve a specific booking by its ID."""
-        result = await self.db.execute(select(Booking).filter(Booking.booking_id == booking_id))
+    async def stream_bookings(self, fetch_size: int):
+        """Yield all bookings in batches of `fetch_size`, read through a server-side cursor."""
+        result = await self.db.stream_scalars(
+            select(Booking).order_by(Booking.booking_id).execution_options(yield_per=fetch_size)
+        )
+        async for batch in result.partitions():
+            yield batch
+
+    async def get_bookings_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        client_id: Optional[UUID] = None,
+        tour_id: Optional[UUID] = None,
+        expand: Collection[str] = (),
+    ) -> Tuple[List[Booking], bool]:
+        """Retrieve one page of bookings, newest first by (booking_date, booking_id), and whether more pages follow."""
+        query = _expand(select(Booking), expand)
+        if client_id is not None:
+            query = query.where(Booking.client_id == client_id)
+        if tour_id is not None:
+            query = query.where(Booking.tour_id == tour_id)
+        if after is not None:
+            query = query.where(tuple_(Booking.booking_date, Booking.booking_id) < tuple_(*after))
+
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        query = query.order_by(Booking.booking_date.desc(), Booking.booking_id.desc()).limit(limit + 1)
+        result = await self.db.execute(query)
+        bookings = result.scalars().all()
+        return bookings[:limit], len(bookings) > limit
+
+    async def get_booking_by_id(self, booking_id: UUID, expand: Collection[str] = (), for_update: bool = False):
+        """Retrieve a specific booking by its ID.
+
+        With `for_update` the row is locked until the end of the transaction and
+        read afresh, so the seats it holds cannot change before they are moved.
+        """
+        query = _expand(select(Booking), expand, loader=joinedload).filter(Booking.booking_id == booking_id)
+        if for_update:
+            query = query.with_for_update().execution_options(populate_existing=True)
+        result = await self.db.execute(query)
         return result.scalar_one_or_none()
 
-    async def create_booking(self, booking_data: dict):
-        """Create a new booking."""
+    async def create_booking(self, booking_data: dict, from_hold: bool = False):
+        """Create a new booking, taking its seats from the tour.
+
+        Otherwise the seats are taken from the counts in Redis first, so seats
+        held by others stay off sale. With `from_hold`, they come from a
+        claimed hold and are already off sale there.
+        """
         booking = Booking(**booking_data)
         self.db.add(booking)
-        await self.db.commit()
+        # Insert first, so the tour row stays locked only from the seat update to the commit
+        await self.db.flush()
+        changes = seats_held(booking.tour_id, booking.seats, booking.status)
+        await self._take_seats(changes, taken=from_hold)
         await self.db.refresh(booking)
         return booking
 
     async def update_booking(self, booking_id: UUID, update_data: dict):
-        """Update an existing booking."""
-        booking = await self.get_booking_by_id(booking_id)
+        """Update an existing booking, moving seats between tours or back to the tour as needed."""
+        booking = await self.get_booking_by_id(booking_id, for_update=True)
         if not booking:
             return None
+        held = seats_held(booking.tour_id, booking.seats, booking.status)
         for key, value in update_data.items():
             setattr(booking, key, value)
-        await self.db.commit()
+        await self.db.flush()
+        changes = seat_changes(held, seats_held(booking.tour_id, booking.seats, booking.status))
+        await self._take_seats(changes)
+        await adjust_seat_counts(_given_back(changes))
         await self.db.refresh(booking)
         return booking
 
+    async def _take_seats(self, changes: Dict[UUID, int], taken: bool = False):
+        """Take `changes` in Redis unless already `taken` there, then in Postgres, and commit."""
+        if not taken and not (await take_seats(self.db, [changes]))[0]:
+            await self.db.rollback()
+            raise NotEnoughSeatsException()
+        try:
+            if await adjust_seats(self.db, changes):
+                await self.db.rollback()
+                raise NotEnoughSeatsException()
+            await self.db.commit()
+        except BaseException:
+            if not taken:
+                await give_back_seats([changes])
+            raise
+
     async def delete_booking(self, booking_id: UUID):
-        """Delete a booking by its ID."""
-        booking = await self.get_booking_by_id(booking_id)
+        """Delete a booking by its ID, giving its seats back to the tour."""
+        booking = await self.get_booking_by_id(booking_id, for_update=True)
         if booking:
             await self.db.delete(booking)
+            changes = seat_changes(seats_held(booking.tour_id, booking.seats, booking.status), {})
+            await adjust_seats(self.db, changes)
             await self.db.commit()
+            await adjust_seat_counts(changes)
         return booking
+
+    async def apply_batch(
+        self, client_id: UUID, items: List[BookingBatchItem]
+    ) -> List[Tuple[Optional[Booking], Optional[str]]]:
+        """Create, update and cancel many bookings in one transaction.
+
+        Returns a (booking, error) pair per item, in order. Items referring to
+        a missing tour or booking, or needing more seats than their tour has
+        left, fail on their own. All the others are applied with one seat
+        UPDATE, one multi-row INSERT ... RETURNING and one executemany UPDATE.
+        """
+        results: List[Tuple[Optional[Booking], Optional[str]]] = [(None, None)] * len(items)
+
+        tour_ids = {item.tour_id for item in items if item.tour_id is not None}
+        booking_ids = {item.booking_id for item in items if item.booking_id is not None}
+        known_tours = set((await self.db.scalars(select(Tour.tour_id).where(Tour.tour_id.in_(tour_ids)))).all())
+        existing = {
+            booking.booking_id: booking
+            # Locked, in a fixed order so concurrent batches cannot deadlock, and read afresh: the seats they
+            # hold must not change before they are moved
+            for booking in await self.db.scalars(
+                select(Booking)
+                .where(Booking.booking_id.in_(booking_ids))
+                .order_by(Booking.booking_id)
+                .with_for_update()
+                .execution_options(populate_existing=True)
+            )
+        }
+
+        creates, updates, changes = [], [], {}
+        seen_bookings = set()
+        for index, item in enumerate(items):
+            if item.tour_id is not None and item.tour_id not in known_tours:
+                results[index] = (None, "Tour not found")
+            elif item.action != "create" and item.booking_id not in existing:
+                results[index] = (None, "Booking not found")
+            elif item.booking_id in seen_bookings:
+                results[index] = (None, "Booking appears more than once in the batch")
+            elif item.action == "create":
+                values = {"client_id": client_id, "tour_id": item.tour_id}
+                values.update(item.model_dump(include={"status", "seats"}, exclude_none=True))
+                creates.append((index, values))
+                changes[index] = seats_held(item.tour_id, values.get("seats", 1), values.get("status", "confirmed"))
+            else:
+                seen_bookings.add(item.booking_id)
+                values = {"booking_id": item.booking_id}
+                if item.action == "cancel":
+                    values["status"] = CANCELED
+                else:
+                    values.update(item.model_dump(include={"tour_id", "status", "seats"}, exclude_none=True))
+                updates.append((index, values))
+                booking = existing[item.booking_id]
+                changes[index] = seat_changes(
+                    seats_held(booking.tour_id, booking.seats, booking.status),
+                    seats_held(
+                        values.get("tour_id", booking.tour_id),
+                        values.get("seats", booking.seats),
+                        values.get("status", booking.status),
+                    ),
+                )
+
+        # Seats held in Redis are off sale: take them there first, admitting items in order while they fit
+        admitted = await take_seats(self.db, list(changes.values()))
+        taken = {index: change for (index, change), fits in zip(list(changes.items()), admitted) if fits}
+        self._refuse_seats(results, changes, lambda index, _: index not in taken)
+        try:
+            # A tour that cannot give out all the seats asked of it refuses the whole statement. Then lock the
+            # refused tours, admit their takers in item order while seats last, and try again without the rest
+            # (rolling back to the savepoint drops the partial update and its row locks).
+            while True:
+                savepoint = await self.db.begin_nested()
+                total_changes = _sum_changes(changes.values())
+                refused = await adjust_seats(self.db, total_changes)
+                if not refused:
+                    await savepoint.commit()
+                    break
+                await savepoint.rollback()
+                seats_left = dict((await self.db.execute(
+                    select(Tour.tour_id, Tour.seats_left).where(Tour.tour_id.in_(refused)).with_for_update()
+                )).all())
+                pending = len(changes)
+                for tour_id in refused:
+                    if tour_id not in seats_left:
+                        # Deleted since we checked: nothing can be booked on it or given back to it
+                        self._refuse_seats(results, changes, lambda index, change: tour_id in change)
+                        continue
+                    # Seats given back by the batch are available to it
+                    budget = seats_left[tour_id] - sum(min(change.get(tour_id, 0), 0) for change in changes.values())
+                    for index, change in list(changes.items()):
+                        wanted = change.get(tour_id, 0)
+                        if wanted > budget:
+                            self._refuse_seats(results, changes, lambda other, _: other == index)
+                        elif wanted > 0:
+                            budget -= wanted
+                if len(changes) == pending:
+                    # Cannot happen unless the counts moved under us; never loop on it
+                    self._refuse_seats(results, changes, lambda index, change: refused & change.keys())
+            creates = [(index, values) for index, values in creates if index in changes]
+            updates = [(index, values) for index, values in updates if index in changes]
+
+            if creates:
+                created = await self.db.scalars(
+                    insert(Booking).returning(Booking, sort_by_parameter_order=True),
+                    [values for _, values in creates],
+                )
+                for (index, _), booking in zip(creates, created.all()):
+                    results[index] = (booking, None)
+
+            # Items without anything to change (an update with no fields) still report the booking
+            changed = [(index, values) for index, values in updates if len(values) > 1]
+            # One executemany needs the same columns in every row; consecutive runs keep the item order
+            for _, rows in groupby((values for _, values in changed), key=lambda values: sorted(values)):
+                await self.db.execute(update(Booking), list(rows))
+            if updates:
+                updated_ids = {values["booking_id"] for _, values in updates}
+                updated = await self.db.execute(
+                    select(Booking)
+                    .where(Booking.booking_id.in_(updated_ids))
+                    .execution_options(populate_existing=True)
+                )
+                bookings = {booking.booking_id: booking for booking in updated.scalars()}
+                for index, values in updates:
+                    results[index] = (bookings[values["booking_id"]], None)
+
+            await self.db.commit()
+        except BaseException:
+            await give_back_seats(taken.values())
+            raise
+        # Items Postgres refused after all give their seats back to Redis, the others mirror the seats they freed
+        await give_back_seats(change for index, change in taken.items() if index not in changes)
+        await adjust_seat_counts(_sum_changes(_given_back(change) for change in changes.values()))
+        return results
+
+    @staticmethod
+    def _refuse_seats(results, changes, predicate):
+        for index, change in list(changes.items()):
+            if predicate(index, change):
+                results[index] = (None, "Not enough seats left on this tour")
+                del changes[index]
+
+
+def _sum_changes(changes) -> Dict[UUID, int]:
+    total = {}
+    for change in changes:
+        for tour_id, seats in change.items():
+            total[tour_id] = total.get(tour_id, 0) + seats
+    return {tour_id: seats for tour_id, seats in total.items() if seats}
+
+
+def _given_back(changes: Dict[UUID, int]) -> Dict[UUID, int]:
+    return {tour_id: seats for tour_id, seats in changes.items() if seats < 0}
@@ -1,69 +1,152 @@
-import json
-
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from src.database import get_db, redis_client
-from src.bookings.repo import BookingRepository
-from src.config import CACHE_EXPIRATION
+from src.cache import bump_generation, cached, make_key
+from src.config import EXPORT_FETCH_SIZE, FAST_READ_PATH, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from src.database import get_db, get_read_db
+from src.export import export_response
+from src.idempotency import idempotent
+from src.pagination import decode_cursor, encode_cursor
+from src.bookings.fast_repo import BookingFastRepository
+from src.bookings.holds import adjust_seat_counts, claim_hold, hold_seats, release_hold
+from src.bookings.repo import EXPANDABLE, BookingRepository
+from src.bookings.schemas import BookingBatch, SeatHoldCreate
 from src.auth.services import get_current_user
 from src.auth.models import User
+from src.tours.routers import serialize_tour
 
 booking_router = APIRouter()
 
 
-def serialize_booking(booking):
-    """Helper function to serialize a Booking object."""
-    return {
+def serialize_booking(booking, expand: Tuple[str, ...] = ()):
+    """Helper function to serialize a Booking object, with the `expand`ed relationships loaded alongside."""
+    data = {
         "booking_id": str(booking.booking_id),
         "client_id": str(booking.client_id),
         "tour_id": str(booking.tour_id),
         "status": booking.status,
+        "seats": booking.seats,
         "booking_date": booking.booking_date.isoformat() if isinstance(booking.booking_date, datetime) else None
     }
+    if "tour" in expand:
+        data["tour"] = serialize_tour(booking.tour)
+    if "client" in expand:
+        # Only what other users may see, never the personal details
+        data["client"] = {"user_id": str(booking.client.user_id), "user_name": booking.client.user_name}
+    return data
+
+
+def get_expand(
+    expand: Optional[str] = Query(
+        None,
+        pattern=f"^({'|'.join(EXPANDABLE)})(,({'|'.join(EXPANDABLE)}))*$",
+        description="Comma-separated related objects to include: " + ", ".join(EXPANDABLE),
+    )
+) -> Tuple[str, ...]:
+    return tuple(sorted(set(expand.split(",")))) if expand else ()
 
 
 @booking_router.get("/")
+@cached(key=lambda expand, **_: make_key("all_bookings", expand=expand), family="bookings", cluster_lock=True)
 async def get_all_bookings(
-    db: AsyncSession = Depends(get_db),
+    expand: Tuple[str, ...] = Depends(get_expand),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    cache_key = "all_bookings"
-    cached_data = await redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data.decode("utf-8"))
-
     repository = BookingRepository(db)
-    bookings = await repository.get_all_bookings()
-    result = [serialize_booking(booking) for booking in bookings]
-    await redis_client.setex(cache_key, CACHE_EXPIRATION, json.dumps(result))
-    return result
+    bookings = await repository.get_all_bookings(expand=expand)
+    return [serialize_booking(booking, expand) for booking in bookings]
+
+
+async def _read_bookings_page(db: AsyncSession, limit: int, cursor: Optional[str], expand: Tuple[str, ...], **filters):
+    after = decode_cursor(cursor) if cursor else None
+    if FAST_READ_PATH and not expand:
+        items, has_more = await BookingFastRepository(db).get_bookings_page(limit=limit, after=after, **filters)
+    else:
+        repository = BookingRepository(db)
+        bookings, has_more = await repository.get_bookings_page(limit=limit, after=after, expand=expand, **filters)
+        items = [serialize_booking(booking, expand) for booking in bookings]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(
+            datetime.fromisoformat(items[-1]["booking_date"]), UUID(items[-1]["booking_id"])
+        ) if has_more else None,
+    }
+
+
+def _my_bookings_key(cursor, limit, expand, current_user, **_):
+    return make_key(f"my_bookings_{current_user.user_id}", cursor=cursor, limit=limit, expand=expand)
+
+
+def _tour_bookings_key(tour_id, cursor, limit, expand, **_):
+    return make_key(f"tour_bookings_{tour_id}", cursor=cursor, limit=limit, expand=expand)
+
+
+@booking_router.get("/me")
+@cached(key=_my_bookings_key, family="bookings")
+async def get_my_bookings(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    expand: Tuple[str, ...] = Depends(get_expand),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The caller's bookings, newest first, a page at a time."""
+    return await _read_bookings_page(db, limit, cursor, expand, client_id=current_user.user_id)
+
+
+@booking_router.get("/tour/{tour_id}")
+@cached(key=_tour_bookings_key, family="bookings")
+async def get_tour_bookings(
+    tour_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    expand: Tuple[str, ...] = Depends(get_expand),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """A tour's bookings, newest first, a page at a time."""
+    return await _read_bookings_page(db, limit, cursor, expand, tour_id=tour_id)
+
+
+@booking_router.get("/export")
+async def export_bookings(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    return export_response(
+        db,
+        lambda session: BookingRepository(session).stream_bookings(EXPORT_FETCH_SIZE),
+        serialize_booking,
+        format,
+        filename="bookings",
+    )
 
 
 @booking_router.get("/{booking_id}")
+@cached(key=lambda booking_id, expand, **_: f"booking_{booking_id}_{','.join(expand)}", family="bookings")
 async def get_booking_by_id(
     booking_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    expand: Tuple[str, ...] = Depends(get_expand),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    cache_key = f"booking_{booking_id}"
-    cached_data = await redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data.decode("utf-8"))
-
-    repository = BookingRepository(db)
-    booking = await repository.get_booking_by_id(booking_id)
+    if FAST_READ_PATH and not expand:
+        booking = await BookingFastRepository(db).get_booking_by_id(booking_id)
+    else:
+        booking = await BookingRepository(db).get_booking_by_id(booking_id, expand=expand)
+        booking = booking and serialize_booking(booking, expand)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
-
-    result = serialize_booking(booking)
-    await redis_client.setex(cache_key, CACHE_EXPIRATION, json.dumps(result))
-    return result
+    return booking
 
 
 @booking_router.post("/")
+@idempotent
 async def create_booking(
     booking_data: dict,
     db: AsyncSession = Depends(get_db),
@@ -72,10 +155,85 @@ async def create_booking(
     repository = BookingRepository(db)
     booking_data["client_id"] = str(current_user.user_id)
     new_booking = await repository.create_booking(booking_data)
-    redis_client.delete("all_bookings")  # Invalidate the cache for all bookings
+    await bump_generation("bookings")
     return new_booking
 
 
+@booking_router.post("/batch")
+@idempotent
+async def apply_booking_batch(
+    batch: BookingBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Create, update and cancel many bookings in one transaction, with a result per item."""
+    repository = BookingRepository(db)
+    results = await repository.apply_batch(current_user.user_id, batch.items)
+    if any(booking is not None for booking, _ in results):
+        await bump_generation("bookings")
+    return [
+        {"booking": serialize_booking(booking)} if booking is not None else {"error": error}
+        for booking, error in results
+    ]
+
+
+def serialize_hold(hold):
+    return {
+        "hold_id": str(hold["hold_id"]),
+        "tour_id": str(hold["tour_id"]),
+        "seats": hold["seats"],
+        "expires_at": hold["expires_at"].isoformat(),
+    }
+
+
+@booking_router.post("/holds")
+@idempotent
+async def create_hold(
+    hold_data: SeatHoldCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Hold seats on a tour for SEAT_HOLD_TTL seconds, until confirmed or released."""
+    hold = await hold_seats(db, hold_data.tour_id, current_user.user_id, hold_data.seats)
+    if not hold:
+        raise HTTPException(status_code=404, detail="Tour not found")
+    return serialize_hold(hold)
+
+
+@booking_router.post("/holds/{hold_id}/confirm")
+async def confirm_hold(
+    hold_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Turn a live hold into a booking."""
+    hold = await claim_hold(hold_id, current_user.user_id)
+    if not hold:
+        raise HTTPException(status_code=404, detail="Hold not found")
+
+    repository = BookingRepository(db)
+    try:
+        booking = await repository.create_booking(
+            {"client_id": current_user.user_id, "tour_id": hold["tour_id"], "seats": hold["seats"]}, from_hold=True
+        )
+    except BaseException:
+        await adjust_seat_counts({hold["tour_id"]: -hold["seats"]})
+        raise
+    await bump_generation("bookings")
+    return serialize_booking(booking)
+
+
+@booking_router.delete("/holds/{hold_id}")
+async def delete_hold(
+    hold_id: UUID,
+    current_user: User = Depends(get_current_user)
+):
+    hold = await release_hold(hold_id, current_user.user_id)
+    if not hold:
+        raise HTTPException(status_code=404, detail="Hold not found")
+    return {"hold_id": str(hold_id), "released_seats": hold["seats"]}
+
+
 @booking_router.put("/{booking_id}")
 async def update_booking(
     booking_id: UUID,
@@ -88,8 +246,7 @@ async def update_booking(
     if not updated_booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    redis_client.delete("all_bookings")
-    redis_client.delete(f"booking_{booking_id}")
+    await bump_generation("bookings")
     return updated_booking
 
 
@@ -104,6 +261,5 @@ async def delete_booking(
     if not deleted_booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    redis_client.delete("all_bookings")
-    redis_client.delete(f"booking_{booking_id}")
+    await bump_generation("bookings")
     return deleted_booking
@@ -0,0 +1,33 @@
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field, model_validator
+
+from src.config import BOOKING_BATCH_MAX_SIZE
+
+
+class BookingBatchItem(BaseModel):
+    """One operation of a batch: create needs tour_id, update and cancel need booking_id."""
+
+    action: Literal["create", "update", "cancel"]
+    booking_id: Optional[UUID] = None
+    tour_id: Optional[UUID] = None
+    status: Optional[str] = None
+    seats: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def check_required_ids(self):
+        if self.action == "create" and self.tour_id is None:
+            raise ValueError("tour_id is required to create a booking")
+        if self.action != "create" and self.booking_id is None:
+            raise ValueError(f"booking_id is required to {self.action} a booking")
+        return self
+
+
+class BookingBatch(BaseModel):
+    items: List[BookingBatchItem] = Field(min_length=1, max_length=BOOKING_BATCH_MAX_SIZE)
+
+
+class SeatHoldCreate(BaseModel):
+    tour_id: UUID
+    seats: int = Field(default=1, ge=1)
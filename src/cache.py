@@ -0,0 +1,478 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import math
+import random
+import time
+import uuid
+
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Union
+
+import orjson
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.compression import CACHED_LEVELS, ENCODINGS, compress, negotiate_encoding
+from src.config import (CACHE_EARLY_REFRESH_BETA, CACHE_LOCK_TIMEOUT, CACHE_TTLS, COMPRESSION_MINIMUM_SIZE,
+                        LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+from src.database import primary_session, redis_bytes_client, redis_client
+
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache_invalidation"
+GENERATION_NAMESPACE = "cache_generation"
+GENERATION_PREFIX = "generation:"
+LAST_MODIFIED_PREFIX = "last_modified:"
+LOCK_POLL_INTERVAL = 0.05
+
+_invalidation_handlers: Dict[str, Callable[[str], None]] = {}
+_subscription_handlers: List[Callable[[], Awaitable[None]]] = []
+# Recomputations running in this worker, so concurrent misses for a key share one
+_in_flight: Dict[str, asyncio.Future] = {}
+# Strong references to background refreshes so they are not garbage collected mid-flight
+_background_refreshes = set()
+
+# Deletes the lock only if we still own it, so a slow holder never frees someone else's lock
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# KEYS: the resource's validators. ARGV: etag of the new body, current unix time, ttl.
+# Last-Modified has one-second resolution, so a changed body always moves it forward by at least a
+# second, even if that runs a little ahead of the clock; an unchanged body keeps it.
+_LAST_MODIFIED_SCRIPT = """
+local last_modified = tonumber(ARGV[2])
+local previous = redis.call('GET', KEYS[1])
+if previous then
+    local etag, modified = string.match(previous, '^(.*) (%d+)$')
+    if etag == ARGV[1] then
+        last_modified = tonumber(modified)
+    else
+        last_modified = math.max(last_modified, tonumber(modified) + 1)
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1] .. ' ' .. last_modified, 'EX', ARGV[3])
+return last_modified
+"""
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable, Any], bool]):
+        """Drop every entry for which `predicate(key, value)` is true."""
+        for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def register_invalidation_handler(namespace: str, handler: Callable[[str], None]):
+    """Call `handler(key)` whenever any worker publishes an invalidation for `namespace`."""
+    _invalidation_handlers[namespace] = handler
+
+
+def register_subscription_handler(handler: Callable[[], Awaitable[None]]):
+    """Await `handler()` after every (re)subscription, to resync state that may have missed messages."""
+    _subscription_handlers.append(handler)
+
+
+def _dispatch_invalidation(message: str):
+    namespace, _, key = message.partition(":")
+    handler = _invalidation_handlers.get(namespace)
+    if handler is not None:
+        handler(key)
+
+
+async def publish_invalidation(namespace: str, key: str):
+    """Invalidate `key` in this worker right away and broadcast it to all the others."""
+    message = f"{namespace}:{key}"
+    _dispatch_invalidation(message)
+    await redis_client.publish(INVALIDATION_CHANNEL, message)
+
+
+async def listen_for_invalidations():
+    """Apply invalidations published by other workers; runs for the lifetime of the app."""
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                for handler in _subscription_handlers:
+                    await handler()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        _dispatch_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Entries still expire by TTL while we are disconnected
+            logger.exception("Lost the cache invalidation subscription, reconnecting")
+            await asyncio.sleep(1)
+
+
+# L1 in front of Redis, holding the same entries
+_local_cache = TTLCache(maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL)
+# Last known generation of each key family, so building a key rarely costs a round trip
+_local_generations = TTLCache(maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL)
+
+
+def _drop_local_generation(family: str):
+    _local_generations.pop(family)
+
+
+async def _drop_local_cache():
+    _local_cache.clear()
+    _local_generations.clear()
+
+
+register_invalidation_handler(GENERATION_NAMESPACE, _drop_local_generation)
+# Invalidations sent while we were not subscribed are lost, so start over
+register_subscription_handler(_drop_local_cache)
+
+
+def make_key(prefix: str, **params) -> str:
+    """Stable cache key for a family of results that vary by many parameters."""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{prefix}_{digest}"
+
+
+async def get_generation(family: str) -> int:
+    generation = _local_generations.get(family)
+    if generation is None:
+        generation = int(await redis_client.get(f"{GENERATION_PREFIX}{family}") or 0)
+        _local_generations.set(family, generation)
+    return generation
+
+
+async def bump_generation(family: str) -> int:
+    """Invalidate every key cached under `family` at once; the old entries just age out."""
+    generation = await redis_client.incr(f"{GENERATION_PREFIX}{family}")
+    await publish_invalidation(GENERATION_NAMESPACE, family)
+    return generation
+
+
+def _dump_entry(entry: dict) -> bytes:
+    # A one-line JSON header, then the cached bytes untouched, followed by their compressed
+    # variants; orjson never emits a raw newline
+    variants = entry.get("variants", {})
+    header = {name: value for name, value in entry.items() if name not in ("value", "variants")}
+    header["variant_sizes"] = {encoding: len(body) for encoding, body in variants.items()}
+    return orjson.dumps(header) + b"\n" + entry["value"] + b"".join(variants.values())
+
+
+def _parse_entry(data: bytes) -> dict:
+    header, _, payload = data.partition(b"\n")
+    entry = orjson.loads(header)
+    variants = {}
+    end = len(payload)
+    for encoding, size in reversed(list(entry.pop("variant_sizes", {}).items())):
+        variants[encoding] = payload[end - size:end]
+        end -= size
+    return {**entry, "value": payload[:end], "variants": variants}
+
+
+def _compress_variants(value: bytes) -> dict:
+    if len(value) < COMPRESSION_MINIMUM_SIZE:
+        return {}
+    return {encoding: compress(value, encoding, CACHED_LEVELS) for encoding in ENCODINGS}
+
+
+async def _load(key: str) -> Optional[dict]:
+    entry = _local_cache.get(key)
+    if entry is not None:
+        return entry
+    cached = await redis_bytes_client.get(key)
+    if cached is None:
+        return None
+    entry = _parse_entry(cached)
+    _local_cache.set(key, entry)
+    return entry
+
+
+async def _last_modified(resource: Optional[str], etag: str, ttl: int) -> int:
+    if resource is None:
+        return int(time.time())
+    return await redis_client.eval(
+        _LAST_MODIFIED_SCRIPT, 1, f"{LAST_MODIFIED_PREFIX}{resource}", etag, int(time.time()), ttl
+    )
+
+
+async def _compute_and_store(key: str, compute, family: str, resource: Optional[str] = None) -> dict:
+    soft_ttl, hard_ttl = CACHE_TTLS.get(family, CACHE_TTLS["default"])
+    started_at = time.monotonic()
+    value = await compute()
+    etag = f'"{hashlib.blake2b(value, digest_size=16).hexdigest()}"'
+    entry = {
+        "value": value,
+        # Recompute cost, which scales how early XFetch starts refreshing
+        "delta": time.monotonic() - started_at,
+        "soft_expires_at": time.time() + soft_ttl,
+        "etag": etag,
+        # Tracked per `resource` across generations, so a refill with another body is never mistaken for
+        # the one before it, even within the same second; one rendering the same body is no modification
+        "last_modified": await _last_modified(resource, etag, hard_ttl),
+        "variants": await asyncio.to_thread(_compress_variants, value),
+    }
+    await redis_bytes_client.setex(key, hard_ttl, _dump_entry(entry))
+    _local_cache.set(key, entry)
+    return entry
+
+
+def _should_refresh(entry: dict) -> bool:
+    """XFetch: refresh with a probability that rises towards the soft expiry, always once past it."""
+    jitter = -entry["delta"] * CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+    return time.time() + jitter >= entry["soft_expires_at"]
+
+
+async def _acquire_lock(lock_key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    if await redis_client.set(lock_key, token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000)):
+        return token
+
+
+async def _compute_with_cluster_lock(key: str, compute, family: str, resource: Optional[str] = None) -> dict:
+    lock_key = f"lock:{key}"
+    token = await _acquire_lock(lock_key)
+    if token is not None:
+        try:
+            return await _compute_and_store(key, compute, family, resource)
+        finally:
+            await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    # Another worker is recomputing; wait for its result, but not past its lock timeout
+    deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = await _load(key)
+        if entry is not None:
+            return entry
+        if not await redis_client.exists(lock_key):
+            break
+    return await _compute_and_store(key, compute, family, resource)
+
+
+async def _single_flight(key: str, fill: Callable[[], Awaitable[Any]]) -> Any:
+    in_flight = _in_flight.get(key)
+    if in_flight is not None:
+        try:
+            return await asyncio.shield(in_flight)
+        except asyncio.CancelledError:
+            if not in_flight.cancelled():
+                raise
+            # The request computing it went away; take over
+            return await _single_flight(key, fill)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        value = await fill()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()  # Waiters re-raise it; nobody else needs to see it logged
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        del _in_flight[key]
+
+
+async def _refresh(key: str, compute, family: str, resource: Optional[str] = None):
+    # At most one refresh per key across the cluster; whoever loses the lock keeps serving
+    lock_key = f"lock:{key}"
+    token = await _acquire_lock(lock_key)
+    if token is None:
+        return
+    try:
+        await _single_flight(key, lambda: _compute_and_store(key, compute, family, resource))
+    except Exception:
+        logger.exception("Background refresh of %s failed, serving the stale entry", key)
+    finally:
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+
+def _refresh_in_background(key: str, compute, family: str, resource: Optional[str] = None):
+    if key in _in_flight:
+        return
+    task = asyncio.create_task(_refresh(key, compute, family, resource))
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+
+async def _get_entry(
+    key: str, compute, family: str, cluster_lock: bool, background_compute, resource: Optional[str] = None
+) -> dict:
+    entry = await _load(key)
+    if entry is not None:
+        if _should_refresh(entry):
+            _refresh_in_background(key, background_compute or compute, family, resource)
+        return entry
+
+    if cluster_lock:
+        return await _single_flight(key, lambda: _compute_with_cluster_lock(key, compute, family, resource))
+    return await _single_flight(key, lambda: _compute_and_store(key, compute, family, resource))
+
+
+async def get_or_compute(
+    key: str,
+    compute: Callable[[], Awaitable[bytes]],
+    family: str = "default",
+    cluster_lock: bool = False,
+    background_compute: Optional[Callable[[], Awaitable[bytes]]] = None,
+) -> bytes:
+    """Cache-aside read of a bytes value with stale-while-revalidate.
+
+    Entries live for the family's hard TTL. Once past the soft TTL (or
+    earlier, at random, per XFetch) they are still served while a single
+    background task runs `background_compute()` (default `compute`) to
+    refresh them.
+
+    On a miss only one coroutine per worker runs `compute()` and the others
+    wait for its result. With `cluster_lock` a Redis lock extends that to one
+    recomputation across all workers.
+    """
+    entry = await _get_entry(key, compute, family, cluster_lock, background_compute)
+    return entry["value"]
+
+
+def _not_modified(request: Request, etag: str, entry: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Takes precedence over If-Modified-Since, as in RFC 9110, and uses the weak comparison:
+        # proxies that transform the body hand back our tags marked W/
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return entry["last_modified"] <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached(key: Union[str, Callable[..., str]], family: str = "default", cluster_lock: bool = False):
+    """Cache the JSON response of an async route handler with `get_or_compute`.
+
+    The result is rendered once with orjson and the body, along with its
+    brotli and gzip variants when large enough, is cached as is, so a hit is
+    served without any JSON decoding, encoding or compression. Responses
+    carry an ETag and Last-Modified, and conditional requests matching them
+    get a 304 straight from the cache.
+
+    `key` is either a template formatted with the call's arguments, e.g.
+    "tour_{tour_id}", or a callable receiving those arguments by name. It is
+    stored under the family's current generation, so `bump_generation(family)`
+    invalidates it together with every other key of the family.
+    Background refreshes outlive the request, so any `AsyncSession` argument
+    is swapped for a fresh session on the same engine when they run. Sessions
+    on a read replica are swapped for the primary whenever the result is
+    cached, as a lagging replica would otherwise refill the cache with data
+    from before the write that invalidated it.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, _request: Optional[Request] = None, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            cache_key = key(**arguments) if callable(key) else key.format(**arguments)
+            # The same resource across generations, for its Last-Modified
+            resource = f"{family}:{cache_key}"
+            cache_key = f"{family}:{await get_generation(family)}:{cache_key}"
+
+            async def compute_with_fresh_sessions(replicas_only: bool = False):
+                sessions = {
+                    name: primary_session(value)
+                    for name, value in arguments.items()
+                    if isinstance(value, AsyncSession) and (value.info.get("replica") or not replicas_only)
+                }
+                try:
+                    return orjson.dumps(await func(**{**arguments, **sessions}))
+                finally:
+                    for session in sessions.values():
+                        await session.close()
+
+            async def compute_in_background():
+                return await compute_with_fresh_sessions()
+
+            async def compute():
+                return await compute_with_fresh_sessions(replicas_only=True)
+
+            entry = await _get_entry(cache_key, compute, family, cluster_lock, compute_in_background, resource)
+            body, etag = entry["value"], entry["etag"]
+            headers = {"Last-Modified": formatdate(entry["last_modified"], usegmt=True)}
+            variants = entry.get("variants")
+            if variants:
+                headers["Vary"] = "Accept-Encoding"
+                encoding = negotiate_encoding(_request.headers.get("accept-encoding")) if _request else None
+                if encoding in variants:
+                    # Each representation needs its own strong validator
+                    body, etag = variants[encoding], f'{etag[:-1]}-{encoding}"'
+                    headers["Content-Encoding"] = encoding
+            headers["ETag"] = etag
+            if _request is not None and _not_modified(_request, etag, entry):
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        # Have FastAPI pass in the request as well, for the conditional headers
+        return with_request_parameter(wrapper, signature)
+
+    return decorator
+
+
+def with_request_parameter(wrapper, signature: inspect.Signature):
+    """Advertise `signature` plus a keyword-only `_request: Request` on `wrapper`, so FastAPI passes the request in."""
+    parameters = list(signature.parameters.values())
+    request_parameter = inspect.Parameter("_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+    if parameters and parameters[-1].kind == inspect.Parameter.VAR_KEYWORD:
+        parameters.insert(-1, request_parameter)
+    else:
+        parameters.append(request_parameter)
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
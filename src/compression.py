@@ -0,0 +1,137 @@
+import gzip
+import zlib
+
+from typing import Optional
+
+import brotli
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Preferred first when a client accepts several
+ENCODINGS = ("br", "gzip")
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Per-request compression must stay cheap; cached variants are made once per fill and can afford more
+FAST_LEVELS = {"br": 4, "gzip": 6}
+CACHED_LEVELS = {"br": 9, "gzip": 9}
+# Streamed bodies are flushed at least this often, so a large export reaches the client as it is produced
+STREAM_FLUSH_SIZE = 64 * 1024
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best of `ENCODINGS` allowed by an Accept-Encoding header, if any."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, levels: dict = FAST_LEVELS) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=levels["br"])
+    return gzip.compress(body, compresslevel=levels["gzip"], mtime=0)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str, flush_size: int = STREAM_FLUSH_SIZE):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=FAST_LEVELS["br"])
+            self._process, self._flush = self._compressor.process, self._compressor.flush
+            self.finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(FAST_LEVELS["gzip"], zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            self._process, self.finish = self._compressor.compress, self._compressor.flush
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.flush_size = flush_size
+        self._unflushed = 0
+
+    def compress(self, data: bytes) -> bytes:
+        # Otherwise the compressor holds on to its input until it has enough to fill a block
+        chunk = self._process(data)
+        self._unflushed += len(data)
+        if self._unflushed >= self.flush_size:
+            chunk += self._flush()
+            self._unflushed = 0
+        return chunk
+
+
+class CompressionMiddleware:
+    """Compresses JSON and text responses of at least `minimum_size` bytes with brotli or gzip.
+
+    Responses that already carry a Content-Encoding, such as the pre-compressed
+    cached variants served by `src.cache.cached`, are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            headers = MutableHeaders(raw=start_message["headers"])
+            if compressor is None and not more_body:
+                # The whole body in one message: compress it only if it is worth it
+                if len(body) >= self.minimum_size:
+                    body = compress(body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if compressor is None:
+                # Streaming: the final size is unknown, so always compress
+                compressor = _StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                await send(start_message)
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -16,6 +16,32 @@ DB_PORT: int = os.getenv("DB_PORT", default=5432)
 DB_NAME: str = os.getenv("POSTGRES_DB", default="db")
 
 DATABASE_URL: PostgresDsn = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Read replicas as comma-separated host[:port], sharing the primary's credentials and database name
+DB_REPLICA_HOSTS: list = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", default="").split(",") if host.strip()]
+DATABASE_REPLICA_URLS: list = [
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{host if ':' in host else f'{host}:{DB_PORT}'}/{DB_NAME}"
+    for host in DB_REPLICA_HOSTS
+]
+# Replicas lagging further behind than this many seconds are skipped in favour of the primary
+DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", default=5))
+# How long a replica's measured lag is trusted before it is measured again
+DB_REPLICA_LAG_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", default=1))
+# Lag checks giving no answer within this many seconds count the replica as unreachable
+DB_REPLICA_CHECK_TIMEOUT: float = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", default=0.5))
+# For this many seconds after a user's own write, their reads go to the primary so they see it
+READ_YOUR_WRITES_WINDOW: float = float(os.getenv("READ_YOUR_WRITES_WINDOW", default=10))
+# Logs every statement, synchronously; only for local debugging
+DB_ECHO: bool = os.getenv("DB_ECHO", "0") == "1"
+# Connections kept open per worker, and how many more may be opened under load
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", default=10))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", default=10))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", default=30))
+# Seconds after which a connection is replaced, to stay under server or proxy idle timeouts
+DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", default=1800))
+DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Prepared statements cached per connection; set to 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", default=100))
 
 POSTGRES_TEST_USER: str = os.getenv("POSTGRES_TEST_USER", default="postgres_test")
 POSTGRES_TEST_PASSWORD: str = os.getenv("POSTGRES_TEST_PASSWORD", default="postgres_test")
@@ -28,4 +54,45 @@ DATABASE_TEST_SYNC_URL: PostgresDsn = f"postgresql://{POSTGRES_TEST_USER}:{POSTG
 
 REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
 
-CACHE_EXPIRATION = os.getenv("CACHE_EXPIRATION", default=300)
\ No newline at end of file
+CACHE_EXPIRATION = int(os.getenv("CACHE_EXPIRATION", default=300))
+# (soft TTL, hard TTL) in seconds per cache key family. Past the soft TTL an entry is
+# still served while one background task refreshes it; past the hard TTL it is gone.
+CACHE_TTLS = {
+    "default": (CACHE_EXPIRATION, CACHE_EXPIRATION),
+    "tours": (
+        int(os.getenv("TOURS_CACHE_SOFT_TTL", default=60)),
+        int(os.getenv("TOURS_CACHE_HARD_TTL", default=CACHE_EXPIRATION)),
+    ),
+    "bookings": (
+        int(os.getenv("BOOKINGS_CACHE_SOFT_TTL", default=30)),
+        int(os.getenv("BOOKINGS_CACHE_HARD_TTL", default=120)),
+    ),
+}
+# XFetch beta: above 1 refreshes earlier, below 1 closer to the soft TTL
+CACHE_EARLY_REFRESH_BETA: float = float(os.getenv("CACHE_EARLY_REFRESH_BETA", default=1.0))
+# In-process cache in front of Redis, per worker; writes evict it everywhere over pub/sub
+LOCAL_CACHE_SIZE: int = int(os.getenv("LOCAL_CACHE_SIZE", default=1000))
+LOCAL_CACHE_TTL: float = float(os.getenv("LOCAL_CACHE_TTL", default=5))
+# How long a worker holding the cluster-wide recompute lock may take before others give up waiting
+CACHE_LOCK_TIMEOUT: float = float(os.getenv("CACHE_LOCK_TIMEOUT", default=10))
+
+# Smaller responses are sent uncompressed, as compressing them saves next to nothing
+COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", default=1024))
+
+PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", default=50))
+PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", default=200))
+
+# Most operations accepted by one POST /bookings/batch
+BOOKING_BATCH_MAX_SIZE: int = int(os.getenv("BOOKING_BATCH_MAX_SIZE", default=500))
+# Rows fetched per round trip from the server-side cursor behind an export
+EXPORT_FETCH_SIZE: int = int(os.getenv("EXPORT_FETCH_SIZE", default=1000))
+# Rows sent per COPY during a bulk tour import; all of them still commit together
+TOUR_IMPORT_BATCH_SIZE: int = int(os.getenv("TOUR_IMPORT_BATCH_SIZE", default=1000))
+# How long seats stay held in Redis for a checkout before going back on sale
+SEAT_HOLD_TTL: int = int(os.getenv("SEAT_HOLD_TTL", default=600))
+# How long the response to a request sent with an Idempotency-Key is kept for replaying to its retries
+IDEMPOTENCY_TTL: int = int(os.getenv("IDEMPOTENCY_TTL", default=86400))
+# How long retries wait for the first request with their key to finish before giving up with a 409
+IDEMPOTENCY_LOCK_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", default=30))
+# Serve tour and booking reads with prepared statements straight on asyncpg instead of through the ORM
+FAST_READ_PATH: bool = os.getenv("FAST_READ_PATH", "0") == "1"
@@ -1,26 +1,242 @@
-from src.config import DATABASE_URL, REDIS_HOST
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+import time
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from src.config import (DATABASE_REPLICA_URLS, DATABASE_URL, DB_ECHO, DB_MAX_OVERFLOW, DB_POOL_PRE_PING,
+                        DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_REPLICA_CHECK_TIMEOUT,
+                        DB_REPLICA_LAG_CHECK_INTERVAL, DB_REPLICA_MAX_LAG, DB_STATEMENT_CACHE_SIZE,
+                        READ_YOUR_WRITES_WINDOW, REDIS_HOST)
+from typing import AsyncGenerator, List, Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from redis.asyncio import Redis
 
 
+logger = logging.getLogger(__name__)
+
+
 redis_client = Redis(host=REDIS_HOST, port=6379, db=0, decode_responses=True)
+# For values that are served as they are, e.g. pre-rendered response bodies
+redis_bytes_client = Redis(host=REDIS_HOST, port=6379, db=0)
+
+
+class MonitoredPool(AsyncAdaptedQueuePool):
+    """The default async pool, also recording how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
 
-async_engine = create_async_engine(DATABASE_URL, future=True, echo=True)
+    def _do_get(self):
+        started_at = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        wait_time = time.monotonic() - started_at
+        self.checkouts += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+        return connection
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        future=True,
+        echo=DB_ECHO,
+        poolclass=MonitoredPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # asyncpg's own statement cache, and SQLAlchemy's cache of prepared statements on top of it
+        connect_args={
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+async_engine = _create_engine(DATABASE_URL)
 async_session = sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
 
+# Seconds of replay lag; 0 when fully caught up, or when pointed at a server that is not a replica
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """Hands out read replicas round-robin, skipping any lagging more than `max_lag` seconds behind the primary.
+
+    Each replica's lag is measured at most once per `check_interval` seconds; a
+    replica that cannot be reached, or does not answer within `check_timeout`
+    seconds, counts as infinitely behind until the next check.
+    """
+
+    def __init__(
+        self, engines: List[AsyncEngine], max_lag: float, check_interval: float,
+        check_timeout: float = DB_REPLICA_CHECK_TIMEOUT,
+    ):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._next = itertools.cycle(range(len(engines)))
+        self._lags = [(float("inf"), float("-inf"))] * len(engines)
+        self._locks = [asyncio.Lock() for _ in engines]
+
+    async def _query_lag(self, index: int) -> float:
+        async with self.engines[index].connect() as connection:
+            return float(await connection.scalar(REPLICA_LAG_QUERY))
+
+    async def _measure(self, index: int) -> float:
+        # Requests wanting this replica wait on the check, so never let a blackholed host stall them for long
+        try:
+            return await asyncio.wait_for(self._query_lag(index), self.check_timeout)
+        except (exc.SQLAlchemyError, OSError, asyncio.TimeoutError) as error:
+            logger.warning("Replica %d is unavailable: %r", index, error)
+            return float("inf")
+
+    async def lag(self, index: int) -> float:
+        lag, checked_at = self._lags[index]
+        if time.monotonic() - checked_at < self.check_interval:
+            return lag
+        async with self._locks[index]:
+            lag, checked_at = self._lags[index]
+            if time.monotonic() - checked_at >= self.check_interval:
+                lag = await self._measure(index)
+                self._lags[index] = (lag, time.monotonic())
+        return lag
+
+    async def choose(self) -> Optional[AsyncEngine]:
+        """The next replica close enough behind the primary, or None to use the primary."""
+        for _ in range(len(self.engines)):
+            index = next(self._next)
+            if await self.lag(index) <= self.max_lag:
+                return self.engines[index]
+        return None
+
+    def stats(self) -> list:
+        return [{"lag_s": lag, "pool": pool_stats(engine)} for engine, (lag, _) in zip(self.engines, self._lags)]
+
+
+replica_router = ReplicaRouter(
+    [_create_engine(url) for url in DATABASE_REPLICA_URLS], DB_REPLICA_MAX_LAG, DB_REPLICA_LAG_CHECK_INTERVAL
+)
+
 Base = declarative_base()
 
 # TODO add MongoDB connector
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+def pool_stats(engine: AsyncEngine = async_engine) -> dict:
+    """Occupancy of the engine's connection pool in this worker, plus wait times if it is a `MonitoredPool`."""
+    pool = engine.pool
+    stats = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # Negative while fewer than `size` connections are open
+        "overflow": max(pool.overflow(), 0),
+        "timeout_s": pool.timeout(),
+    }
+    if isinstance(pool, MonitoredPool):
+        checkouts = pool.checkouts or 1
+        stats.update({
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "avg_wait_ms": round(pool.wait_time_total / checkouts * 1000, 3),
+            "max_wait_ms": round(pool.wait_time_max * 1000, 3),
+        })
+    return stats
+
+
+async def driver_connection(db: AsyncSession):
+    """The asyncpg connection under a session, from the same pool, for statements that bypass SQLAlchemy."""
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+READ_PRIMARY_PREFIX = "read_primary:"
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_commit(session: Session):
+    session.info["committed"] = True
+
+
+def _request_subject(request: Optional[Request]) -> Optional[str]:
+    """The user a request's bearer token is for; unverified, as it only steers where reads go."""
+    authorization = request.headers.get("authorization", "") if request is not None else ""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
+async def get_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
     """Dependency for getting async session"""
     session: AsyncSession = async_session()
     try:
         yield session
     finally:
-        await session.close()
\ No newline at end of file
+        await session.close()
+        # Runs before the response is sent, so the caller's next read already sees the write
+        subject = _request_subject(request)
+        if replica_router.engines and subject and session.info.get("committed"):
+            await redis_client.set(f"{READ_PRIMARY_PREFIX}{subject}", 1, px=int(READ_YOUR_WRITES_WINDOW * 1000))
+
+
+def primary_session(session: AsyncSession) -> AsyncSession:
+    """A new session on the same database as `session`, except that one on a replica is swapped for the primary.
+
+    A replica may be behind writes that already invalidated the caches, so
+    what it returns must never be stored where everyone else would read it.
+    """
+    if session.info.get("replica"):
+        return async_session()
+    return AsyncSession(session.bind, expire_on_commit=False)
+
+
+async def get_read_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for a session that is only read from: bound to a replica when one is caught up enough.
+
+    Falls back to the primary when there are no replicas, when they all lag
+    too far behind, and for READ_YOUR_WRITES_WINDOW seconds after the caller
+    committed a write, so they always see their own changes. Whatever is
+    shared with other requests, like cached responses, must be read through
+    `primary_session` instead.
+    """
+    engine = None
+    if replica_router.engines:
+        subject = _request_subject(request)
+        if not (subject and await redis_client.exists(f"{READ_PRIMARY_PREFIX}{subject}")):
+            engine = await replica_router.choose()
+    session: AsyncSession = async_session(bind=engine) if engine is not None else async_session()
+    session.info["replica"] = engine is not None
+    try:
+        yield session
+    finally:
+        await session.close()
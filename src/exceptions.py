@@ -33,4 +33,38 @@ class UserAlreadyExistsException(HTTPException):
         super().__init__(
             status_code=status.HTTP_409_CONFLICT,
             detail="User already exist"
-        )
\ No newline at end of file
+        )
+
+
+class ServiceBusyException(HTTPException):
+    def __init__(self, detail: Any = None) -> None:
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail if detail else "Service is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+class NotEnoughSeatsException(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Not enough seats left on this tour"
+        )
+
+
+class IdempotencyKeyReusedException(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+
+
+class IdempotencyKeyInProgressException(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "1"},
+        )
@@ -0,0 +1,53 @@
+import csv
+import io
+
+from typing import AsyncIterator, Callable, List
+
+import orjson
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _encode_ndjson(rows: List[dict]) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def _encode_csv(rows: List[dict], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def export_response(
+    db: AsyncSession,
+    stream_batches: Callable[[AsyncSession], AsyncIterator[list]],
+    serialize: Callable[[object], dict],
+    format: str,
+    filename: str,
+) -> StreamingResponse:
+    """Stream every row as NDJSON or CSV, one chunk per batch, so memory stays flat however many rows there are.
+
+    `stream_batches(session)` must yield lists of rows from a server-side
+    cursor. It runs on its own session on `db`'s engine, as the request's
+    session is closed once the handler returns, before the body is sent.
+    """
+    async def body():
+        async with AsyncSession(db.bind) as session:
+            first = True
+            async for batch in stream_batches(session):
+                rows = [serialize(row) for row in batch]
+                if rows:
+                    yield _encode_csv(rows, header=first) if format == "csv" else _encode_ndjson(rows)
+                    first = False
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
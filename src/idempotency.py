@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import time
+import uuid
+
+from typing import Optional
+
+import orjson
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from src.cache import with_request_parameter
+from src.config import IDEMPOTENCY_LOCK_TIMEOUT, IDEMPOTENCY_TTL
+from src.database import redis_client
+from src.exceptions import BadRequestException, IdempotencyKeyInProgressException, IdempotencyKeyReusedException
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_PREFIX = "idempotency:"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+# The in-flight marker lapses this many seconds after its request stops renewing it, e.g. because the worker died
+MARKER_TTL = 10
+
+# Delete the in-flight marker only if it is still ours
+_RELEASE_SCRIPT = """
+local record = redis.call('GET', KEYS[1])
+if record and cjson.decode(record)['token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Extend the in-flight marker only if it is still ours
+_RENEW_SCRIPT = """
+local record = redis.call('GET', KEYS[1])
+if record and cjson.decode(record)['token'] == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+async def _renew_marker(key: str, token: str):
+    while True:
+        await asyncio.sleep(MARKER_TTL / 3)
+        try:
+            if not await redis_client.eval(_RENEW_SCRIPT, 1, key, token, int(MARKER_TTL * 1000)):
+                return
+        except Exception:
+            logger.warning("Could not renew the in-flight marker %s", key, exc_info=True)
+
+
+async def _holding_marker(key: str, token: str, handler):
+    """Await `handler`, keeping the in-flight marker alive however long it runs, so no retry runs it again."""
+    renewal = asyncio.create_task(_renew_marker(key, token))
+    try:
+        return await handler
+    finally:
+        renewal.cancel()
+
+
+async def _fingerprint(request: Request) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.method.encode(), request.url.path.encode(), await request.body()):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _replay(record: dict) -> Response:
+    headers = {**record.get("headers", {}), "Idempotent-Replayed": "true"}
+    return Response(
+        content=record["body"], status_code=record["status_code"], media_type="application/json", headers=headers
+    )
+
+
+async def _wait_for(key: str, fingerprint: str) -> Optional[dict]:
+    """The finished record under `key`, waiting for the request holding it; None if that request gave up."""
+    deadline = time.monotonic() + IDEMPOTENCY_LOCK_TIMEOUT
+    while True:
+        record = await redis_client.get(key)
+        if record is None:
+            return None
+        record = orjson.loads(record)
+        if record["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReusedException()
+        if "status_code" in record:
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInProgressException()
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def idempotent(func):
+    """Let clients retry an async route handler safely by sending an `Idempotency-Key` header.
+
+    The first request with a key runs the handler and its response is kept in
+    Redis for IDEMPOTENCY_TTL seconds; later requests with that key and the
+    same method, path and body get it replayed without running the handler,
+    and with a different body a 422. Duplicates arriving while the first is
+    still running wait for its response, for up to IDEMPOTENCY_LOCK_TIMEOUT
+    seconds before getting a 409. Keys are scoped to the caller's
+    `current_user` argument, if the handler has one. Errors below 500 are
+    replayed like any other response; after any other failure the key is
+    released so the request can be retried.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, _request: Optional[Request] = None, **kwargs):
+        idempotency_key = _request.headers.get(IDEMPOTENCY_HEADER) if _request is not None else None
+        if not idempotency_key:
+            return await func(*args, **kwargs)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            raise BadRequestException(f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+        user = signature.bind_partial(*args, **kwargs).arguments.get("current_user")
+        key = f"{IDEMPOTENCY_PREFIX}{getattr(user, 'user_id', '')}:{idempotency_key}"
+        fingerprint = await _fingerprint(_request)
+        token = uuid.uuid4().hex
+        marker = orjson.dumps({"fingerprint": fingerprint, "token": token})
+        while not await redis_client.set(key, marker, nx=True, px=int(MARKER_TTL * 1000)):
+            record = await _wait_for(key, fingerprint)
+            if record is not None:
+                return _replay(record)
+
+        try:
+            result = await _holding_marker(key, token, func(*args, **kwargs))
+        except HTTPException as exc:
+            if exc.status_code >= 500:
+                raise
+            record = {
+                "status_code": exc.status_code,
+                "headers": dict(exc.headers or {}),
+                "body": orjson.dumps({"detail": exc.detail}).decode(),
+            }
+            error = exc
+        except BaseException:
+            await redis_client.eval(_RELEASE_SCRIPT, 1, key, token)
+            raise
+        else:
+            if isinstance(result, Response):
+                record = {"status_code": result.status_code, "body": result.body.decode()}
+            else:
+                record = {"status_code": 200, "body": orjson.dumps(jsonable_encoder(result)).decode()}
+            error = None
+
+        await redis_client.set(key, orjson.dumps({"fingerprint": fingerprint, **record}), px=IDEMPOTENCY_TTL * 1000)
+        if error is not None:
+            raise error
+        return result
+
+    return with_request_parameter(wrapper, signature)
@@ -1,22 +1,41 @@
+import asyncio
 import uvicorn
 
+from contextlib import asynccontextmanager, suppress
 from dotenv import load_dotenv
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.config import DEBUG
+from src.cache import listen_for_invalidations
+from src.compression import CompressionMiddleware
+from src.config import COMPRESSION_MINIMUM_SIZE, DEBUG
+from src.auth.hashing import hashing_service
 from src.auth.routers import auth_router
 from src.bookings.routers import booking_router
+from src.monitoring.routers import monitoring_router
 from src.tours.routers import tours_router
 
 
 load_dotenv()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    invalidation_listener = asyncio.create_task(listen_for_invalidations())
+    yield
+    invalidation_listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await invalidation_listener
+    hashing_service.shutdown()
+
+
 def create_app():
     fast_api_app = FastAPI(
         debug=bool(DEBUG),
         docs_url="/api/docs/",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
     )
 
     fast_api_app.add_middleware(
@@ -26,6 +45,7 @@ def create_app():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    fast_api_app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
 
     return fast_api_app
 
@@ -36,6 +56,7 @@ main_api_router = APIRouter()
 fastapi_app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 fastapi_app.include_router(tours_router, prefix="/tours", tags=["Tours"])
 fastapi_app.include_router(booking_router, prefix="/bookings", tags=["Bookings"])
+fastapi_app.include_router(monitoring_router, prefix="/monitoring", tags=["Monitoring"])
 fastapi_app.include_router(main_api_router)
 
 
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from src.auth.hashing import hashing_service
+from src.auth.models import User
+from src.auth.services import get_current_user
+from src.database import pool_stats, replica_router
+
+
+monitoring_router = APIRouter()
+
+
+@monitoring_router.get("/hashing")
+async def get_hashing_stats(current_user: User = Depends(get_current_user)):
+    return hashing_service.stats()
+
+
+@monitoring_router.get("/db-pool")
+async def get_db_pool_stats(current_user: User = Depends(get_current_user)):
+    return {**pool_stats(), "replicas": replica_router.stats()}
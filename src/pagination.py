@@ -0,0 +1,24 @@
+import base64
+import json
+
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+from src.exceptions import BadRequestException
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Encode a keyset position into an opaque URL-safe cursor."""
+    raw = json.dumps([created_at.isoformat(), str(row_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor produced by `encode_cursor`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, TypeError):
+        raise BadRequestException(detail="Invalid cursor")
@@ -0,0 +1,128 @@
+"""Maintenance commands for tours, e.g. `python -m src.tours.commands rebuild-facets`."""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from src.database import async_session
+from src.auth.models import User
+from src.bookings.models import Booking
+from src.config import TOUR_IMPORT_BATCH_SIZE
+from src.tours.facets import rebuild_facets
+from src.tours.fast_repo import TourFastRepository
+from src.tours.importer import IMPORT_FORMATS, import_tours
+from src.tours.models import Tour
+from src.tours.repo import TourRepository
+from src.tours.routers import serialize_tour
+
+
+async def _rebuild_facets():
+    async with async_session() as session:
+        counts = await rebuild_facets(session)
+    for facet, values in counts.items():
+        print(f"{facet}: {values}")
+
+
+async def _read_chunks(path: str, chunk_size: int = 1 << 16):
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+async def _import_tours(path: str, format: str, batch_size: int):
+    def report_progress(report):
+        print(f"imported={report['imported']} failed={report['failed']}")
+
+    async with async_session() as session:
+        report = await import_tours(session, _read_chunks(path), format, batch_size, on_progress=report_progress)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}")
+    print(f"Done: imported={report['imported']} failed={report['failed']}")
+
+
+async def _time_reads(read, iterations: int):
+    latencies, result = [], None
+    async with async_session() as session:
+        for _ in range(iterations):
+            started_at = time.perf_counter()
+            result = await read(session)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+    return result, latencies
+
+
+async def _benchmark_reads(tours: int, iterations: int, limit: int):
+    """Time the ORM and raw asyncpg read paths on the same queries and check they return the same thing."""
+    destination = f"Read benchmark {uuid.uuid4().hex[:12]}"
+    now = datetime.now()
+    records = [
+        (uuid.uuid4(), destination, 1 + index % 14, float(index), "Bus", "-", None, None, None, now, now)
+        for index in range(tours)
+    ]
+    async with async_session() as session:
+        await TourRepository(session).copy_tours(records)
+        await session.commit()
+    tour_id = records[0][0]
+
+    async def orm_tour(session):
+        return serialize_tour(await TourRepository(session).get_tour_by_id(tour_id))
+
+    async def orm_page(session):
+        page, has_more = await TourRepository(session).get_tours_page(limit, destination=destination)
+        return [serialize_tour(tour) for tour in page], has_more
+
+    async def fast_tour(session):
+        return await TourFastRepository(session).get_tour_by_id(tour_id)
+
+    async def fast_page(session):
+        return await TourFastRepository(session).get_tours_page(limit, destination=destination)
+
+    try:
+        for name, orm_read, fast_read in (("get_tour_by_id", orm_tour, fast_tour), ("get_tours_page", orm_page, fast_page)):
+            # Warm up both paths, so neither pays for connecting or preparing statements in the timings
+            await _time_reads(orm_read, 10)
+            await _time_reads(fast_read, 10)
+            orm_result, orm_latencies = await _time_reads(orm_read, iterations)
+            fast_result, fast_latencies = await _time_reads(fast_read, iterations)
+            if orm_result != fast_result:
+                raise SystemExit(f"{name}: the fast path returned something other than the ORM")
+            orm_mean, fast_mean = statistics.mean(orm_latencies), statistics.mean(fast_latencies)
+            print(f"{name}: orm mean={orm_mean:.3f} ms p50={statistics.median(orm_latencies):.3f} ms | "
+                  f"fast mean={fast_mean:.3f} ms p50={statistics.median(fast_latencies):.3f} ms | "
+                  f"speedup={orm_mean / fast_mean:.2f}x")
+    finally:
+        async with async_session() as session:
+            await session.execute(delete(Tour).where(Tour.destination == destination))
+            await session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-facets", help="Recompute the tour facet counts stored in Redis")
+    importer = commands.add_parser("import-tours", help="Bulk load tours from an NDJSON or CSV file in one transaction")
+    importer.add_argument("path")
+    importer.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    importer.add_argument("--batch-size", type=int, default=TOUR_IMPORT_BATCH_SIZE)
+    benchmark = commands.add_parser("benchmark-reads", help="Compare the ORM and asyncpg read paths for tours")
+    benchmark.add_argument("--tours", type=int, default=1000, help="Tours to create for the benchmark")
+    benchmark.add_argument("--iterations", type=int, default=1000)
+    benchmark.add_argument("--limit", type=int, default=50, help="Page size")
+
+    args = parser.parse_args()
+    if args.command == "rebuild-facets":
+        asyncio.run(_rebuild_facets())
+    elif args.command == "import-tours":
+        format = args.format or ("csv" if os.path.splitext(args.path)[1].lower() == ".csv" else "ndjson")
+        asyncio.run(_import_tours(args.path, format, args.batch_size))
+    elif args.command == "benchmark-reads":
+        asyncio.run(_benchmark_reads(args.tours, args.iterations, args.limit))
+
+
+if __name__ == "__main__":
+    main()
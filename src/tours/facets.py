@@ -0,0 +1,110 @@
+from typing import Dict, Optional
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import redis_client
+from src.tours.models import Tour
+
+# (label, inclusive lower bound, exclusive upper bound)
+DURATION_BUCKETS = (
+    ("1-3", None, 4),
+    ("4-7", 4, 8),
+    ("8-14", 8, 15),
+    ("15+", 15, None),
+)
+COST_BANDS = (
+    ("0-500", None, 500),
+    ("500-1000", 500, 1000),
+    ("1000-2000", 1000, 2000),
+    ("2000-5000", 2000, 5000),
+    ("5000+", 5000, None),
+)
+
+FACET_KEYS = {
+    "transport": "tour_facets:transport",
+    "duration": "tour_facets:duration",
+    "cost": "tour_facets:cost",
+}
+
+
+def _bucket(value, buckets) -> str:
+    for label, low, high in buckets:
+        if (low is None or value >= low) and (high is None or value < high):
+            return label
+
+
+def _bucket_case(column, buckets):
+    whens = []
+    for label, low, high in buckets:
+        conditions = []
+        if low is not None:
+            conditions.append(column >= low)
+        if high is not None:
+            conditions.append(column < high)
+        whens.append((and_(*conditions), label))
+    return case(*whens)
+
+
+def tour_facets(tour: Tour) -> Dict[str, str]:
+    """Facet values a tour is counted under."""
+    return {
+        "transport": tour.transport,
+        "duration": _bucket(tour.duration, DURATION_BUCKETS),
+        "cost": _bucket(tour.cost, COST_BANDS),
+    }
+
+
+async def apply_facet_delta(removed: Optional[Dict[str, str]] = None, added: Optional[Dict[str, str]] = None):
+    """Move a tour's contribution from its old facet values to its new ones atomically."""
+    if removed == added:
+        return
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for facet, key in FACET_KEYS.items():
+            if removed is not None:
+                pipe.hincrby(key, removed[facet], -1)
+            if added is not None:
+                pipe.hincrby(key, added[facet], 1)
+        await pipe.execute()
+
+
+async def add_facet_counts(counts: Dict[str, Dict[str, int]]):
+    """Add the contributions of many new tours at once, e.g. after a bulk import."""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for facet, key in FACET_KEYS.items():
+            for value, count in counts.get(facet, {}).items():
+                pipe.hincrby(key, value, count)
+        await pipe.execute()
+
+
+async def get_facet_counts() -> Dict[str, Dict[str, int]]:
+    """Read every facet's counts in a single round trip."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in FACET_KEYS.values():
+            pipe.hgetall(key)
+        results = await pipe.execute()
+    return {
+        facet: {value: int(count) for value, count in counts.items() if int(count) > 0}
+        for facet, counts in zip(FACET_KEYS, results)
+    }
+
+
+async def rebuild_facets(db: AsyncSession) -> Dict[str, Dict[str, int]]:
+    """Recompute all facet counts from Postgres and swap them in atomically."""
+    columns = {
+        "transport": Tour.transport,
+        "duration": _bucket_case(Tour.duration, DURATION_BUCKETS),
+        "cost": _bucket_case(Tour.cost, COST_BANDS),
+    }
+    counts = {}
+    for facet, column in columns.items():
+        result = await db.execute(select(column, func.count()).group_by(column))
+        counts[facet] = {value: count for value, count in result.all() if value is not None}
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for facet, key in FACET_KEYS.items():
+            pipe.delete(key)
+            if counts[facet]:
+                pipe.hset(key, mapping=counts[facet])
+        await pipe.execute()
+    return counts
@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import driver_connection
+
+
+# The columns `serialize_tour` reads, in the order `_serialize` unpacks them
+TOUR_COLUMNS = "tour_id, destination, duration, cost, transport, hotel, description, capacity, created_at, updated_at"
+
+
+def _serialize(record) -> dict:
+    tour_id, destination, duration, cost, transport, hotel, description, capacity, created_at, updated_at = record
+    return {
+        "tour_id": str(tour_id),
+        "destination": destination,
+        "duration": duration,
+        "cost": cost,
+        "transport": transport,
+        "hotel": hotel,
+        "description": description,
+        "capacity": capacity,
+        "created_at": created_at.isoformat() if created_at is not None else None,
+        "updated_at": updated_at.isoformat() if updated_at is not None else None,
+    }
+
+
+class TourFastRepository:
+    """Read-only `TourRepository` queries run as prepared statements directly on asyncpg.
+
+    Rows are mapped straight into the dicts `serialize_tour` would build,
+    skipping ORM hydration. asyncpg prepares each distinct statement once per
+    connection and keeps it in its statement cache (DB_STATEMENT_CACHE_SIZE).
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_tour_by_id(self, tour_id: UUID) -> Optional[dict]:
+        connection = await driver_connection(self.db)
+        record = await connection.fetchrow(f"SELECT {TOUR_COLUMNS} FROM tours WHERE tour_id = $1::uuid", tour_id)
+        return _serialize(record) if record is not None else None
+
+    async def get_tours_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        destination: Optional[str] = None,
+        transport: Optional[str] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        min_cost: Optional[float] = None,
+        max_cost: Optional[float] = None,
+    ) -> Tuple[List[dict], bool]:
+        """Same page as `TourRepository.get_tours_page`, as serialized tours."""
+        conditions, args = [], []
+
+        def where(condition: str, *values):
+            placeholders = []
+            for value in values:
+                args.append(value)
+                placeholders.append(f"${len(args)}")
+            conditions.append(condition.format(*placeholders))
+
+        if destination is not None:
+            where("destination = {}::varchar", destination)
+        if transport is not None:
+            where("transport = {}::varchar", transport)
+        if min_duration is not None:
+            where("duration >= {}::integer", min_duration)
+        if max_duration is not None:
+            where("duration <= {}::integer", max_duration)
+        if min_cost is not None:
+            where("cost >= {}::float8", min_cost)
+        if max_cost is not None:
+            where("cost <= {}::float8", max_cost)
+        if after is not None:
+            where("(created_at, tour_id) > ({}::timestamp, {}::uuid)", *after)
+
+        args.append(limit + 1)
+        query = (
+            f"SELECT {TOUR_COLUMNS} FROM tours"
+            + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+            + f" ORDER BY created_at, tour_id LIMIT ${len(args)}::integer"
+        )
+        connection = await driver_connection(self.db)
+        records = await connection.fetch(query, *args)
+        return [_serialize(record) for record in records[:limit]], len(records) > limit
@@ -0,0 +1,149 @@
+import codecs
+import csv
+import logging
+import uuid
+
+from collections import Counter, defaultdict
+from typing import AsyncIterable, AsyncIterator, Callable, Optional, Tuple
+
+import orjson
+
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import bump_generation
+from src.config import TOUR_IMPORT_BATCH_SIZE
+from src.tours.facets import add_facet_counts, tour_facets
+from src.tours.repo import TourRepository
+from src.tours.schemas import TourImport
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+# Only this many row errors are listed in the report; all of them are counted
+MAX_REPORTED_ERRORS = 100
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a stream of UTF-8 bytes into lines without holding more than one chunk."""
+    # Skips the byte order mark spreadsheet exports start with, which would otherwise stick to the first header
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _iter_ndjson(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    row_number = 0
+    async for line in lines:
+        row_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            yield row_number, None, f"invalid JSON: {exc}"
+            continue
+        if not isinstance(data, dict):
+            yield row_number, None, "expected a JSON object"
+            continue
+        yield row_number, data, None
+
+
+async def _iter_csv(lines: AsyncIterable[str]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    header = None
+    row_number = 0
+    record = ""
+    async for line in lines:
+        # A quoted field may span lines; wait until the quotes balance
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        line, record = record, ""
+        if header is None:
+            header = next(csv.reader([line]))
+            continue
+        row_number += 1
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if len(values) != len(header):
+            yield row_number, None, f"expected {len(header)} fields, got {len(values)}"
+            continue
+        yield row_number, {name: value or None for name, value in zip(header, values)}, None
+    if record:
+        yield row_number + 1, None, "unterminated quoted field"
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in error.errors())
+
+
+async def import_tours(
+    db: AsyncSession,
+    chunks: AsyncIterable[bytes],
+    format: str,
+    batch_size: int = TOUR_IMPORT_BATCH_SIZE,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Validate and COPY a stream of NDJSON or CSV tours in one transaction.
+
+    Invalid rows are skipped and reported by row number; the valid ones are
+    loaded all together or, if the database rejects any of them, not at all.
+    Facet counts and the tours cache are updated once, after the commit.
+    """
+    rows = _iter_csv(iter_lines(chunks)) if format == "csv" else _iter_ndjson(iter_lines(chunks))
+    repository = TourRepository(db)
+    report = {"imported": 0, "failed": 0, "errors": []}
+    facet_counts = defaultdict(Counter)
+    batch = []
+
+    async def flush():
+        await repository.copy_tours(batch)
+        report["imported"] += len(batch)
+        batch.clear()
+        if on_progress is not None:
+            on_progress(report)
+
+    try:
+        now = await db.scalar(select(func.localtimestamp()))
+        async for row_number, data, error in rows:
+            if error is None:
+                try:
+                    tour = TourImport.model_validate(data)
+                except ValidationError as exc:
+                    error = _describe(exc)
+            if error is not None:
+                report["failed"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": row_number, "error": error})
+                continue
+
+            batch.append((
+                uuid.uuid4(), tour.destination, tour.duration, tour.cost, tour.transport, tour.hotel,
+                tour.description, tour.capacity, tour.capacity, now, now,
+            ))
+            for facet, value in tour_facets(tour).items():
+                facet_counts[facet][value] += 1
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+    if report["imported"]:
+        await add_facet_counts(facet_counts)
+        await bump_generation("tours")
+    logger.info("Imported %d tours, %d rows rejected", report["imported"], report["failed"])
+    return report
@@ -0,0 +1,56 @@
+from typing import Dict, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import Integer, column, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.tours.models import Tour
+
+CANCELED = "canceled"
+
+
+def seats_held(tour_id: UUID, seats: int, status: str) -> Dict[UUID, int]:
+    """Seats a booking in `status` takes from its tour's inventory."""
+    if status == CANCELED:
+        return {}
+    return {tour_id if isinstance(tour_id, UUID) else UUID(tour_id): seats}
+
+
+def seat_changes(old: Dict[UUID, int], new: Dict[UUID, int]) -> Dict[UUID, int]:
+    """Net seats to take (positive) or give back (negative) per tour when holdings go from `old` to `new`."""
+    changes = {tour_id: seats - old.get(tour_id, 0) for tour_id, seats in new.items()}
+    for tour_id, seats in old.items():
+        changes.setdefault(tour_id, -seats)
+    return {tour_id: seats for tour_id, seats in changes.items() if seats}
+
+
+async def adjust_seats(db: AsyncSession, changes: Dict[UUID, int]) -> Set[UUID]:
+    """Take or give back seats on many tours with a single conditional UPDATE; returns the tours that refused.
+
+    A tour only gives out seats it has left, so concurrent bookings can never
+    oversell it: they queue on the row lock and re-check `seats_left` once it
+    is released. Keep the rest of the transaction short after calling this, as
+    the lock is held until commit.
+    """
+    if not changes:
+        return set()
+    delta = values(
+        column("tour_id", PG_UUID(as_uuid=True)), column("seats", Integer), name="delta"
+    ).data(list(changes.items()))
+    result = await db.execute(
+        update(Tour)
+        .where(Tour.tour_id == delta.c.tour_id)
+        .where(or_(Tour.seats_left.is_(None), Tour.seats_left >= delta.c.seats))
+        # Setting updated_at to itself keeps its onupdate from firing: selling a seat does not modify the tour
+        .values(seats_left=Tour.seats_left - delta.c.seats, updated_at=Tour.updated_at)
+        .returning(Tour.tour_id)
+        .execution_options(synchronize_session=False)
+    )
+    return set(changes) - set(result.scalars().all())
+
+
+async def get_availability(db: AsyncSession, tour_id: UUID) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """(capacity, seats_left) of a tour, read fresh rather than from the cache; None if there is no such tour."""
+    result = await db.execute(select(Tour.capacity, Tour.seats_left).where(Tour.tour_id == tour_id))
+    return result.one_or_none()
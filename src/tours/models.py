@@ -1,8 +1,9 @@
 import uuid
 
-from sqlalchemy import Boolean, Column, DateTime, String, func, select, Date, Float, Integer
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (Boolean, CheckConstraint, Column, Computed, DateTime, String, func, select, Date, Float,
+                        Integer, Index)
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 
 from src.database import Base
 
@@ -10,15 +11,40 @@ from src.database import Base
 class Tour(Base):
     """Model representing tours."""
     __tablename__ = "tours"
+    __table_args__ = (
+        # Keyset pagination is ordered by (created_at, tour_id); the equality
+        # filters get their own composite indexes so they can still walk in order.
+        Index("ix_tours_created_at_tour_id", "created_at", "tour_id"),
+        Index("ix_tours_destination_created_at_tour_id", "destination", "created_at", "tour_id"),
+        Index("ix_tours_transport_created_at_tour_id", "transport", "created_at", "tour_id"),
+        Index("ix_tours_search_vector", "search_vector", postgresql_using="gin"),
+        # The pg_trgm indexes on destination and hotel used by the fuzzy search
+        # fallback live in the migrations only, since they need the extension.
+        CheckConstraint("capacity >= 0", name="ck_tours_capacity_non_negative"),
+        CheckConstraint("seats_left >= 0", name="ck_tours_seats_left_non_negative"),
+        CheckConstraint("seats_left <= capacity", name="ck_tours_seats_left_within_capacity"),
+    )
 
     tour_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     destination = Column(String, nullable=False)
-    duration = Column(Integer, nullable=False)  # Duration in days
-    cost = Column(Float, nullable=False)
+    duration = Column(Integer, nullable=False, index=True)  # Duration in days
+    cost = Column(Float, nullable=False, index=True)
     transport = Column(String, nullable=False)
     hotel = Column(String, nullable=False)
     description = Column(String, nullable=True)
+    # Both NULL for tours sold without a seat limit; see src/tours/inventory.py
+    capacity = Column(Integer, nullable=True)
+    seats_left = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(destination, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(hotel, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+    ))  # Only used for querying, never loaded onto instances
 
     bookings = relationship("Booking", back_populates="tour")
\ No newline at end of file
@@ -1,9 +1,25 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import exists, func, or_, select, tuple_
+from src.bookings.holds import forget_seat_counts
+from src.bookings.models import Booking
+from src.database import driver_connection
+from src.exceptions import BadRequestException
+from src.tours.facets import apply_facet_delta, tour_facets
+from src.tours.inventory import CANCELED
 from src.tours.models import Tour
 from uuid import UUID
 
 
+# Every column COPY has to fill; the ORM-side defaults do not apply to it
+IMPORT_COLUMNS = (
+    "tour_id", "destination", "duration", "cost", "transport", "hotel", "description", "capacity", "seats_left",
+    "created_at", "updated_at",
+)
+
+
 class TourRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -13,6 +29,81 @@ class TourRepository:
         result = await self.db.execute(select(Tour))
         return result.scalars().all()
 
+    async def stream_tours(self, fetch_size: int):
+        """Yield all tours in batches of `fetch_size`, read through a server-side cursor."""
+        result = await self.db.stream_scalars(
+            select(Tour).order_by(Tour.created_at, Tour.tour_id).execution_options(yield_per=fetch_size)
+        )
+        async for batch in result.partitions():
+            yield batch
+
+    async def get_tours_page(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        destination: Optional[str] = None,
+        transport: Optional[str] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        min_cost: Optional[float] = None,
+        max_cost: Optional[float] = None,
+    ) -> Tuple[List[Tour], bool]:
+        """Retrieve one page of tours ordered by (created_at, tour_id) and whether more pages follow."""
+        query = select(Tour)
+        if destination is not None:
+            query = query.where(Tour.destination == destination)
+        if transport is not None:
+            query = query.where(Tour.transport == transport)
+        if min_duration is not None:
+            query = query.where(Tour.duration >= min_duration)
+        if max_duration is not None:
+            query = query.where(Tour.duration <= max_duration)
+        if min_cost is not None:
+            query = query.where(Tour.cost >= min_cost)
+        if max_cost is not None:
+            query = query.where(Tour.cost <= max_cost)
+        if after is not None:
+            query = query.where(tuple_(Tour.created_at, Tour.tour_id) > tuple_(*after))
+
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        query = query.order_by(Tour.created_at, Tour.tour_id).limit(limit + 1)
+        result = await self.db.execute(query)
+        tours = result.scalars().all()
+        return tours[:limit], len(tours) > limit
+
+    async def search_tours(self, query: str, limit: int, offset: int = 0) -> Tuple[List[Tour], bool]:
+        """Full-text search over destination, hotel and description, best matches first.
+
+        Falls back to trigram similarity on destination and hotel when the
+        full-text query matches nothing (typos, partial words). Returns the
+        tours and whether the fuzzy fallback was used.
+        """
+        ts_query = func.websearch_to_tsquery("english", query)
+        result = await self.db.execute(
+            select(Tour)
+            .where(Tour.search_vector.op("@@")(ts_query))
+            .order_by(func.ts_rank_cd(Tour.search_vector, ts_query).desc(), Tour.tour_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        tours = result.scalars().all()
+        if tours:
+            return tours, False
+
+        # An empty page past the first one may just be the end of the full-text results
+        if offset and await self.db.scalar(select(exists().where(Tour.search_vector.op("@@")(ts_query)))):
+            return [], False
+
+        similarity = func.greatest(func.similarity(Tour.destination, query), func.similarity(Tour.hotel, query))
+        result = await self.db.execute(
+            select(Tour)
+            .where(or_(Tour.destination.op("%")(query), Tour.hotel.op("%")(query)))
+            .order_by(similarity.desc(), Tour.tour_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return result.scalars().all(), True
+
     async def get_tour_by_id(self, tour_id: UUID):
         """Retrieve a specific tour by its ID."""
         result = await self.db.execute(select(Tour).filter(Tour.tour_id == tour_id))
@@ -20,21 +111,49 @@ class TourRepository:
 
     async def create_tour(self, tour_data: dict):
         """Create a new tour."""
-        tour = Tour(**tour_data)
+        # seats_left is inventory, only ever derived from the capacity and the bookings
+        tour = Tour(**{key: value for key, value in tour_data.items() if key != "seats_left"})
+        tour.seats_left = tour.capacity
         self.db.add(tour)
         await self.db.commit()
         await self.db.refresh(tour)
+        await apply_facet_delta(added=tour_facets(tour))
         return tour
 
+    async def copy_tours(self, records: List[tuple]):
+        """Load rows ordered as `IMPORT_COLUMNS` with COPY, in the session's current transaction."""
+        connection = await driver_connection(self.db)
+        await connection.copy_records_to_table(
+            Tour.__tablename__, records=records, columns=IMPORT_COLUMNS
+        )
+
     async def update_tour(self, tour_id: UUID, update_data: dict):
         """Update an existing tour."""
         tour = await self.get_tour_by_id(tour_id)
         if not tour:
             return None
+        if "capacity" in update_data:
+            # Lock the row before changing it, so no booking can take seats between counting them and storing the result
+            await self.db.refresh(tour, with_for_update=True)
+            # Counted before the changes are applied, which would otherwise be flushed half done
+            booked = await self.db.scalar(
+                select(func.coalesce(func.sum(Booking.seats), 0))
+                .where(Booking.tour_id == tour_id, Booking.status != CANCELED)
+            )
+        old_facets = tour_facets(tour)
         for key, value in update_data.items():
-            setattr(tour, key, value)
+            if key != "seats_left":
+                setattr(tour, key, value)
+        if "capacity" in update_data:
+            if tour.capacity is not None and tour.capacity < booked:
+                await self.db.rollback()
+                raise BadRequestException(f"Capacity cannot be below the {booked} seats already booked")
+            tour.seats_left = None if tour.capacity is None else tour.capacity - booked
         await self.db.commit()
+        if "capacity" in update_data:
+            await forget_seat_counts([tour_id])
         await self.db.refresh(tour)
+        await apply_facet_delta(removed=old_facets, added=tour_facets(tour))
         return tour
 
     async def delete_tour(self, tour_id: UUID):
@@ -43,4 +162,6 @@ class TourRepository:
         if tour:
             await self.db.delete(tour)
             await self.db.commit()
+            await forget_seat_counts([tour_id])
+            await apply_facet_delta(removed=tour_facets(tour))
         return tour
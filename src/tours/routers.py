@@ -1,12 +1,20 @@
-import json
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
-from src.database import get_db, redis_client
+from src.cache import bump_generation, cached, make_key
+from src.database import get_db, get_read_db
+from src.export import export_response
+from src.idempotency import idempotent
+from src.pagination import decode_cursor, encode_cursor
+from src.tours.facets import get_facet_counts
+from src.tours.fast_repo import TourFastRepository
+from src.tours.importer import import_tours
+from src.tours.inventory import get_availability
 from src.tours.repo import TourRepository
-from src.config import CACHE_EXPIRATION
+from src.config import EXPORT_FETCH_SIZE, FAST_READ_PATH, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
 from src.auth.services import get_current_user
 from src.auth.models import User
 
@@ -24,50 +32,135 @@ def serialize_tour(tour):
         "transport": tour.transport,
         "hotel": tour.hotel,
         "description": tour.description,
+        "capacity": tour.capacity,
         "created_at": tour.created_at.isoformat() if isinstance(tour.created_at, datetime) else None,
         "updated_at": tour.updated_at.isoformat() if isinstance(tour.updated_at, datetime) else None,
     }
 
 
+def _tours_page_key(cursor, limit, destination, transport, min_duration, max_duration, min_cost, max_cost, **_):
+    return make_key(
+        "tours_page",
+        cursor=cursor,
+        limit=limit,
+        destination=destination,
+        transport=transport,
+        min_duration=min_duration,
+        max_duration=max_duration,
+        min_cost=min_cost,
+        max_cost=max_cost,
+    )
+
+
+def _tours_search_key(q, limit, offset, **_):
+    return make_key("tours_search", q=q, limit=limit, offset=offset)
+
+
 @tours_router.get("/")
+@cached(key=_tours_page_key, family="tours", cluster_lock=True)
 async def get_all_tours(
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    destination: Optional[str] = None,
+    transport: Optional[str] = None,
+    min_duration: Optional[int] = Query(None, ge=0),
+    max_duration: Optional[int] = Query(None, ge=0),
+    min_cost: Optional[float] = Query(None, ge=0),
+    max_cost: Optional[float] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    cache_key = "all_tours"
-    cached_data = await redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data.decode("utf-8"))
+    repository = TourFastRepository(db) if FAST_READ_PATH else TourRepository(db)
+    tours, has_more = await repository.get_tours_page(
+        limit=limit,
+        after=decode_cursor(cursor) if cursor else None,
+        destination=destination,
+        transport=transport,
+        min_duration=min_duration,
+        max_duration=max_duration,
+        min_cost=min_cost,
+        max_cost=max_cost,
+    )
+    items = tours if FAST_READ_PATH else [serialize_tour(tour) for tour in tours]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(
+            datetime.fromisoformat(items[-1]["created_at"]), UUID(items[-1]["tour_id"])
+        ) if has_more else None,
+    }
+
 
+@tours_router.get("/search")
+@cached(key=_tours_search_key, family="tours")
+async def search_tours(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
     repository = TourRepository(db)
-    tours = await repository.get_all_tours()
-    result = [serialize_tour(tour) for tour in tours]
-    await redis_client.setex(cache_key, CACHE_EXPIRATION, json.dumps(result))
-    return result
+    tours, fuzzy = await repository.search_tours(q, limit=limit + 1, offset=offset)
+    return {
+        "items": [serialize_tour(tour) for tour in tours[:limit]],
+        "next_offset": offset + limit if len(tours) > limit else None,
+        "fuzzy": fuzzy,
+    }
+
+
+@tours_router.get("/facets")
+async def get_tour_facets(current_user: User = Depends(get_current_user)):
+    return await get_facet_counts()
+
+
+@tours_router.get("/export")
+async def export_tours(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    return export_response(
+        db,
+        lambda session: TourRepository(session).stream_tours(EXPORT_FETCH_SIZE),
+        serialize_tour,
+        format,
+        filename="tours",
+    )
 
 
 @tours_router.get("/{tour_id}")
+@cached(key="tour_{tour_id}", family="tours", cluster_lock=True)
 async def get_tour_by_id(
     tour_id: UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    cache_key = f"tour_{tour_id}"
-    cached_data = await redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data.decode("utf-8"))
-
-    repository = TourRepository(db)
-    tour = await repository.get_tour_by_id(tour_id)
+    if FAST_READ_PATH:
+        tour = await TourFastRepository(db).get_tour_by_id(tour_id)
+    else:
+        tour = await TourRepository(db).get_tour_by_id(tour_id)
+        tour = tour and serialize_tour(tour)
     if not tour:
         raise HTTPException(status_code=404, detail="Tour not found")
+    return tour
+
 
-    result = serialize_tour(tour)
-    await redis_client.setex(cache_key, CACHE_EXPIRATION, json.dumps(result))
-    return result
+@tours_router.get("/{tour_id}/availability")
+async def get_tour_availability(
+    tour_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Seats left right now; kept out of the cached tour, which would otherwise be invalidated by every booking."""
+    availability = await get_availability(db, tour_id)
+    if availability is None:
+        raise HTTPException(status_code=404, detail="Tour not found")
+    capacity, seats_left = availability
+    return {"tour_id": str(tour_id), "capacity": capacity, "seats_left": seats_left}
 
 
 @tours_router.post("/")
+@idempotent
 async def create_tour(
     tour_data: dict,
     db: AsyncSession = Depends(get_db),
@@ -75,10 +168,23 @@ async def create_tour(
 ):
     repository = TourRepository(db)
     new_tour = await repository.create_tour(tour_data)
-    await redis_client.delete("all_tours")  # Invalidate the cache for all tours
+    await bump_generation("tours")
     return new_tour
 
 
+@tours_router.post("/import")
+async def import_tours_stream(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk load tours from an NDJSON or CSV request body, streamed; defaults to the Content-Type."""
+    if format is None:
+        format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    return await import_tours(db, request.stream(), format)
+
+
 @tours_router.put("/{tour_id}")
 async def update_tour(
     tour_id: UUID,
@@ -91,8 +197,9 @@ async def update_tour(
     if not updated_tour:
         raise HTTPException(status_code=404, detail="Tour not found")
 
-    await redis_client.delete("all_tours")
-    await redis_client.delete(f"tour_{tour_id}")
+    await bump_generation("tours")
+    # Bookings read with expand=tour embed the tour
+    await bump_generation("bookings")
     return updated_tour
 
 
@@ -107,6 +214,7 @@ async def delete_tour(
     if not deleted_tour:
         raise HTTPException(status_code=404, detail="Tour not found")
 
-    await redis_client.delete("all_tours")
-    await redis_client.delete(f"tour_{tour_id}")
+    await bump_generation("tours")
+    # Bookings read with expand=tour embed the tour
+    await bump_generation("bookings")
     return deleted_tour
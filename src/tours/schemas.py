@@ -0,0 +1,15 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class TourImport(BaseModel):
+    """One row of a bulk tour import."""
+
+    destination: str = Field(min_length=1)
+    duration: int = Field(ge=1)
+    cost: float = Field(ge=0)
+    transport: str = Field(min_length=1)
+    hotel: str = Field(min_length=1)
+    description: Optional[str] = None
+    capacity: Optional[int] = Field(None, ge=0)
@@ -0,0 +1,38 @@
+from uuid import uuid4
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth import dals
+from src.auth.dals import UserDAL
+from src.auth.models import User
+from src.cache import get_generation
+
+from tests.conftest import async_test_session
+
+
+async def test_principals_are_dropped_after_commit(db_async_session: AsyncSession, monkeypatch):
+    suffix = uuid4().hex[:12]
+    user = User(user_name=f"dal-{suffix}", email=f"dal-{suffix}@example.com", hashed_password="!")
+    db_async_session.add(user)
+    await db_async_session.commit()
+    user_id = user.user_id
+    seen = []
+
+    async def invalidate_user_principals(user_id):
+        # What a concurrent request reloading the user would find
+        async with async_test_session() as other:
+            row = await other.execute(select(User.user_name, User.is_active).where(User.user_id == user_id))
+            seen.append(tuple(row.one()))
+
+    monkeypatch.setattr(dals, "invalidate_user_principals", invalidate_user_principals)
+    user_dal = UserDAL(db_async_session)
+    await user_dal.update_user(user_id, user_name=f"renamed-{suffix}")
+    await user_dal.delete_user(user_id)
+    assert seen == [(f"renamed-{suffix}", True), (f"renamed-{suffix}", False)]
+
+
+async def test_user_update_invalidates_expanded_bookings(db_async_session: AsyncSession, sample_user: User):
+    generation = await get_generation("bookings")
+    await UserDAL(db_async_session).update_user(sample_user.user_id, user_name=sample_user.user_name)
+    assert await get_generation("bookings") > generation
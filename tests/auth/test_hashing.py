@@ -0,0 +1,42 @@
+import asyncio
+
+from src.auth.hashing import Hasher, HashingService, calibrate_bcrypt_rounds
+from src.exceptions import ServiceBusyException
+from tests.auth.utils import PASSWORD
+
+
+async def test_hashing_service_roundtrip():
+    service = HashingService(max_workers=2, max_pending=4)
+    hashed_password = await service.get_password_hash(PASSWORD)
+
+    assert Hasher.verify_password(PASSWORD, hashed_password) is True
+    assert await service.verify_password(PASSWORD, hashed_password) is True
+    assert await service.verify_password(PASSWORD + "1", hashed_password) is False
+
+    stats = service.stats()
+    assert stats["completed"] == 3
+    assert stats["pending"] == 0
+    service.shutdown()
+
+
+async def test_hashing_service_rejects_when_saturated():
+    service = HashingService(max_workers=1, max_pending=1)
+    results = await asyncio.gather(
+        service.get_password_hash(PASSWORD),
+        service.get_password_hash(PASSWORD),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(result, ServiceBusyException) for result in results) == 1
+    assert service.stats()["rejected"] == 1
+    service.shutdown()
+
+
+def test_calibrate_bcrypt_rounds():
+    rounds, timings = calibrate_bcrypt_rounds(target_ms=10_000, min_rounds=4, max_rounds=6, samples=1)
+    assert rounds == 6
+    assert set(timings) == {4, 5, 6}
+
+    rounds, timings = calibrate_bcrypt_rounds(target_ms=0, min_rounds=4, max_rounds=6, samples=1)
+    assert rounds == 4
+    assert set(timings) == {4}
@@ -0,0 +1,56 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from src.auth.commands import _revoked_until
+from src.auth.config import REFRESH_TOKEN_EXPIRE_DAYS
+from src.auth.revocation import BloomFilter, is_token_revoked, revoke_token
+from src.auth.services import (IAT, JTI, SUB, create_access_token, create_refresh_token, logout_func,
+                               refresh_token_state)
+from src.exceptions import AuthFailedException
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [str(uuid4()) for _ in range(1000)]
+    for item in items:
+        bloom_filter.add(item)
+
+    assert all(item in bloom_filter for item in items)
+    false_positives = sum(str(uuid4()) in bloom_filter for _ in range(1000))
+    assert false_positives < 50
+
+
+async def test_revoke_token():
+    jti = str(uuid4())
+    assert await is_token_revoked(jti) is False
+
+    await revoke_token(jti, expires_at=int(time.time()) + 60)
+    assert await is_token_revoked(jti) is True
+
+
+async def test_revoke_expired_token_is_noop():
+    jti = str(uuid4())
+    await revoke_token(jti, expires_at=int(time.time()) - 1)
+    assert await is_token_revoked(jti) is False
+
+
+async def test_logout_revokes_refresh_token_past_access_expiry():
+    payload = {SUB: str(uuid4()), JTI: str(uuid4()), IAT: datetime.utcnow()}
+    access = create_access_token(payload, expires_delta=timedelta(seconds=1))
+    refresh = create_refresh_token(payload)
+
+    await logout_func(access)
+    await asyncio.sleep(1.5)
+    with pytest.raises(AuthFailedException):
+        await refresh_token_state(refresh)
+
+
+def test_blacklist_entries_stay_revoked_for_the_refresh_token():
+    issued_at = int(time.time()) - 3600
+    claims = {JTI: str(uuid4()), IAT: issued_at, "exp": issued_at + 1800}
+    assert _revoked_until(claims) == issued_at + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    assert _revoked_until({JTI: claims[JTI], "exp": claims["exp"]}) == claims["exp"]
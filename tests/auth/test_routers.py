@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
@@ -5,8 +7,14 @@ from httpx import AsyncClient
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from jose import jwt
+from passlib.hash import bcrypt
+
+from src.auth.config import REFRESH_TOKEN_EXPIRE_DAYS
 from src.auth.hashing import Hasher
-from src.auth.models import TokenBlacklist, User
+from src.auth.models import User
+from src.auth.revocation import is_token_revoked
+from src.database import redis_client
 from tests.auth.utils import EMAIL, PASSWORD, USER_NAME, create_test_user
 from tests.conftest import client, db_async_session
 
@@ -52,6 +60,24 @@ async def test_login(client: AsyncClient, db_async_session: AsyncSession):
     assert response_data["token_type"] == "bearer"
 
 
+async def test_login_rehashes_outdated_hash(client: AsyncClient, db_async_session: AsyncSession):
+    user = User(user_name="rehash_user", email="rehash@example.com", hashed_password=bcrypt.using(rounds=4).hash(PASSWORD))
+    db_async_session.add(user)
+    await db_async_session.commit()
+    assert Hasher.needs_update(user.hashed_password) is True
+
+    response = await client.post(
+        "/auth/login",
+        data={"username": "rehash_user", "password": PASSWORD},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    await db_async_session.refresh(user)
+    assert Hasher.needs_update(user.hashed_password) is False
+    assert Hasher.verify_password(PASSWORD, user.hashed_password) is True
+
+
 async def test_bad_login(client: AsyncClient, db_async_session: AsyncSession):
     await create_test_user(db_async_session)
     response = await client.post(
@@ -120,6 +146,13 @@ async def test_logout(client: AsyncClient, db_async_session: AsyncSession):
         headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
 
+    # Resolve the user once so logout has a cached principal to drop
+    response = await client.get(
+        "/monitoring/hashing",
+        headers={"Authorization": f"Bearer {response_login.json()['access']}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
     response = await client.post(
         "/auth/logout",
         headers={"Authorization": f"Bearer {response_login.json()['access']}"}
@@ -128,12 +161,17 @@ async def test_logout(client: AsyncClient, db_async_session: AsyncSession):
     response_data = response.json()
     assert response_data["msg"] == "Succesfully logout"
 
-    stmt = select(TokenBlacklist).filter_by(token=response_login.json()["access"])
-    result = await db_async_session.execute(stmt)
-    blacklisted_token = result.scalar_one_or_none()
+    claims = jwt.get_unverified_claims(response_login.json()["access"])
+    assert await is_token_revoked(claims["jti"]) is True
+    # Revoked for as long as the refresh token sharing its jti is valid, not just the access token
+    ttl = await redis_client.ttl(f"revoked_token:{claims['jti']}")
+    assert claims["exp"] - time.time() < ttl <= REFRESH_TOKEN_EXPIRE_DAYS * 86400
 
-    assert blacklisted_token is not None
-    assert blacklisted_token.token == response_login.json()["access"]
+    response = await client.get(
+        "/monitoring/hashing",
+        headers={"Authorization": f"Bearer {response_login.json()['access']}"}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
 async def test_change_password(client: AsyncClient, db_async_session: AsyncSession):
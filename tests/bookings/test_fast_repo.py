@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import User
+from src.bookings.fast_repo import BookingFastRepository
+from src.bookings.models import Booking
+from src.bookings.repo import BookingRepository
+from src.bookings.routers import serialize_booking
+from src.tours.models import Tour
+
+
+async def test_matches_booking_repository(db_async_session: AsyncSession, sample_user: User):
+    tour = Tour(destination="Gdansk", duration=3, cost=400.00, transport="Train", hotel="Hanza")
+    db_async_session.add(tour)
+    await db_async_session.flush()
+    booked_at = datetime(2026, 2, 1, 9, 30)
+    bookings = [
+        Booking(client_id=sample_user.user_id, tour_id=tour.tour_id, seats=index + 1,
+                booking_date=booked_at + timedelta(hours=index // 2))
+        for index in range(5)
+    ]
+    db_async_session.add_all(bookings)
+    await db_async_session.commit()
+    orm, fast = BookingRepository(db_async_session), BookingFastRepository(db_async_session)
+
+    booking_id = bookings[2].booking_id
+    assert await fast.get_booking_by_id(booking_id) == serialize_booking(await orm.get_booking_by_id(booking_id))
+
+    after = None
+    while True:
+        orm_page, orm_more = await orm.get_bookings_page(limit=2, after=after, tour_id=tour.tour_id)
+        fast_page, fast_more = await fast.get_bookings_page(limit=2, after=after, tour_id=tour.tour_id)
+        assert fast_page == [serialize_booking(booking) for booking in orm_page]
+        assert fast_more == orm_more
+        if not orm_more:
+            break
+        after = (orm_page[-1].booking_date, orm_page[-1].booking_id)
+
+    mine, _ = await fast.get_bookings_page(limit=200, client_id=sample_user.user_id)
+    assert {booking.booking_id for booking in bookings} <= {UUID(item["booking_id"]) for item in mine}
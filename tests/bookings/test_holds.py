@@ -0,0 +1,138 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import User
+from src.bookings.holds import (SEAT_COUNT_PREFIX, claim_hold, hold_seats, reconcile_seat_counts, release_hold)
+from src.bookings.repo import BookingRepository
+from src.bookings.schemas import BookingBatchItem
+from src.database import redis_client
+from src.exceptions import NotEnoughSeatsException
+from src.tours.inventory import get_availability
+from src.tours.repo import TourRepository
+
+
+TOUR_DATA = {"destination": "Lisbon", "duration": 4, "cost": 700.00, "transport": "Plane", "hotel": "Tivoli"}
+
+
+async def _seat_count(tour_id):
+    return await redis_client.get(f"{SEAT_COUNT_PREFIX}{tour_id}")
+
+
+async def test_holds_never_exceed_seats_left(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 5})
+
+    async def hold():
+        try:
+            return await hold_seats(db_async_session, tour.tour_id, sample_user.user_id, 1)
+        except NotEnoughSeatsException:
+            return None
+
+    holds = await asyncio.gather(*(hold() for _ in range(20)))
+    assert sum(hold is not None for hold in holds) == 5
+    assert await _seat_count(tour.tour_id) == "0"
+    # Holds do not touch Postgres
+    assert await get_availability(db_async_session, tour.tour_id) == (5, 5)
+
+
+async def test_release_and_expiry_put_seats_back(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 3})
+    user_id = sample_user.user_id
+    hold = await hold_seats(db_async_session, tour.tour_id, user_id, 2)
+    await hold_seats(db_async_session, tour.tour_id, user_id, 1, ttl=1)
+    with pytest.raises(NotEnoughSeatsException):
+        await hold_seats(db_async_session, tour.tour_id, user_id, 1)
+
+    assert await release_hold(hold["hold_id"], uuid4()) is None
+    assert (await release_hold(hold["hold_id"], user_id))["seats"] == 2
+    assert await release_hold(hold["hold_id"], user_id) is None
+    assert await _seat_count(tour.tour_id) == "2"
+
+    await asyncio.sleep(1.1)
+    await hold_seats(db_async_session, tour.tour_id, user_id, 3)
+    assert await _seat_count(tour.tour_id) == "0"
+
+
+async def test_confirmed_hold_becomes_booking(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 4})
+    tour_id, user_id = tour.tour_id, sample_user.user_id
+    hold = await hold_seats(db_async_session, tour_id, user_id, 3)
+
+    claimed = await claim_hold(hold["hold_id"], user_id)
+    repository = BookingRepository(db_async_session)
+    booking = await repository.create_booking(
+        {"client_id": user_id, "tour_id": tour_id, "seats": claimed["seats"]}, from_hold=True
+    )
+    assert booking.seats == 3
+    assert await claim_hold(hold["hold_id"], user_id) is None
+    assert await get_availability(db_async_session, tour_id) == (4, 1)
+    assert await _seat_count(tour_id) == "1"
+
+    # Bookings made without a hold, and cancellations, are mirrored onto the count
+    await repository.update_booking(booking.booking_id, {"status": "canceled"})
+    assert await _seat_count(tour_id) == "4"
+
+
+async def test_held_seats_are_not_sold_without_the_hold(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 1})
+    tour_id, user_id = tour.tour_id, sample_user.user_id
+    hold = await hold_seats(db_async_session, tour_id, user_id, 1)
+
+    repository = BookingRepository(db_async_session)
+    with pytest.raises(NotEnoughSeatsException):
+        await repository.create_booking({"client_id": user_id, "tour_id": tour_id, "seats": 1})
+    results = await repository.apply_batch(user_id, [BookingBatchItem(action="create", tour_id=tour_id)])
+    assert results == [(None, "Not enough seats left on this tour")]
+    assert await _seat_count(tour_id) == "0"
+
+    claimed = await claim_hold(hold["hold_id"], user_id)
+    await repository.create_booking(
+        {"client_id": user_id, "tour_id": tour_id, "seats": claimed["seats"]}, from_hold=True
+    )
+    assert await get_availability(db_async_session, tour_id) == (1, 0)
+    assert await _seat_count(tour_id) == "0"
+
+
+async def test_bookings_refused_by_postgres_give_their_seats_back(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 2})
+    tour_id, user_id = tour.tour_id, sample_user.user_id
+    await hold_seats(db_async_session, tour_id, user_id, 1)
+    # Redis believes there are more seats than Postgres has left
+    await redis_client.set(f"{SEAT_COUNT_PREFIX}{tour_id}", 5)
+
+    with pytest.raises(NotEnoughSeatsException):
+        await BookingRepository(db_async_session).create_booking({"client_id": user_id, "tour_id": tour_id, "seats": 3})
+    assert await _seat_count(tour_id) == "5"
+
+
+async def test_reconcile_repairs_drift(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 6})
+    await hold_seats(db_async_session, tour.tour_id, sample_user.user_id, 2)
+    await redis_client.set(f"{SEAT_COUNT_PREFIX}{tour.tour_id}", 6)
+
+    report = await reconcile_seat_counts(db_async_session)
+    assert report["repaired"] >= 1
+    assert await _seat_count(tour.tour_id) == "4"
+
+
+async def test_hold_routes(client: AsyncClient, db_async_session: AsyncSession, sample_user: User, jwt_token: str):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 2})
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+
+    response = await client.post("/bookings/holds", json={"tour_id": str(uuid4())}, headers=headers)
+    assert response.status_code == 404
+    response = await client.post("/bookings/holds", json={"tour_id": str(tour.tour_id), "seats": 3}, headers=headers)
+    assert response.status_code == 409
+
+    response = await client.post("/bookings/holds", json={"tour_id": str(tour.tour_id), "seats": 2}, headers=headers)
+    assert response.status_code == 200
+    hold_id = response.json()["hold_id"]
+
+    response = await client.post(f"/bookings/holds/{hold_id}/confirm", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["seats"] == 2
+    assert (await client.post(f"/bookings/holds/{hold_id}/confirm", headers=headers)).status_code == 404
+    assert (await client.delete(f"/bookings/holds/{hold_id}", headers=headers)).status_code == 404
@@ -1,13 +1,18 @@
 import pytest
+from datetime import datetime, timedelta
 from uuid import uuid4
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from src.bookings.models import Booking
 from src.bookings.repo import BookingRepository
+from src.bookings.schemas import BookingBatchItem
 from src.tours.models import Tour
 from src.auth.models import User
 
+from tests.conftest import async_test_engine
+
 
 async def test_get_all_bookings(db_async_session: AsyncSession, sample_booking_data):
     repository = BookingRepository(db_async_session)
@@ -23,6 +28,62 @@ async def test_get_all_bookings(db_async_session: AsyncSession, sample_booking_d
     assert any(b.status == sample_booking_data["status"] for b in bookings)
 
 
+async def test_get_bookings_page(db_async_session: AsyncSession, sample_user: User, sample_tour: Tour):
+    client = User(user_name=f"pager-{uuid4()}", email=f"pager-{uuid4()}@example.com", hashed_password="hashed")
+    tour = Tour(destination="Porto", duration=3, cost=500.00, transport="Plane", hotel="Infante")
+    db_async_session.add_all([client, tour])
+    await db_async_session.flush()
+    booked_at = datetime(2026, 1, 1)
+    bookings = [
+        Booking(client_id=client.user_id if index % 2 else sample_user.user_id, tour_id=tour.tour_id,
+                booking_date=booked_at + timedelta(days=index // 2))
+        for index in range(5)
+    ]
+    db_async_session.add_all(bookings)
+    await db_async_session.commit()
+    repository = BookingRepository(db_async_session)
+
+    pages, after, has_more = [], None, True
+    while has_more:
+        page, has_more = await repository.get_bookings_page(limit=2, after=after, tour_id=tour.tour_id)
+        pages.append(page)
+        after = (page[-1].booking_date, page[-1].booking_id)
+    listed = [booking for page in pages for booking in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert {booking.booking_id for booking in listed} == {booking.booking_id for booking in bookings}
+    assert [booking.booking_date for booking in listed] == sorted((b.booking_date for b in bookings), reverse=True)
+
+    mine, has_more = await repository.get_bookings_page(limit=10, client_id=client.user_id)
+    assert {booking.booking_id for booking in mine} == {bookings[1].booking_id, bookings[3].booking_id}
+    assert not has_more
+
+
+async def test_get_bookings_page_expanded(db_async_session: AsyncSession, sample_user: User):
+    tours = [Tour(destination=f"Expand {index}", duration=2, cost=300.00, transport="Bus", hotel="Inn")
+             for index in range(3)]
+    db_async_session.add_all(tours)
+    await db_async_session.flush()
+    db_async_session.add_all([Booking(client_id=sample_user.user_id, tour_id=tour.tour_id) for tour in tours])
+    await db_async_session.commit()
+    tour_ids = {tour.tour_id for tour in tours}
+    db_async_session.expunge_all()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(async_test_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        bookings, _ = await BookingRepository(db_async_session).get_bookings_page(
+            limit=200, client_id=sample_user.user_id, expand=("client", "tour")
+        )
+    finally:
+        event.remove(async_test_engine.sync_engine, "before_cursor_execute", listener)
+
+    # The page, then one query per expanded relationship however many bookings there are
+    assert len(statements) == 3
+    assert tour_ids <= {booking.tour.tour_id for booking in bookings}
+    assert {booking.client.user_name for booking in bookings} == {sample_user.user_name}
+
+
 async def test_get_booking_by_id(db_async_session: AsyncSession, sample_booking_data):
     repository = BookingRepository(db_async_session)
 
@@ -89,3 +150,29 @@ async def test_delete_booking(db_async_session: AsyncSession, sample_booking_dat
     result = await db_async_session.execute(stmt)
     booking_in_db = result.scalar_one_or_none()
     assert booking_in_db is None
+
+
+async def test_apply_batch(db_async_session: AsyncSession, sample_user: User, sample_tour: Tour, sample_booking_data):
+    repository = BookingRepository(db_async_session)
+    existing = Booking(**sample_booking_data)
+    db_async_session.add(existing)
+    await db_async_session.commit()
+
+    items = [
+        BookingBatchItem(action="create", tour_id=sample_tour.tour_id),
+        BookingBatchItem(action="create", tour_id=uuid4()),
+        BookingBatchItem(action="create", tour_id=sample_tour.tour_id, status="pending"),
+        BookingBatchItem(action="cancel", booking_id=existing.booking_id),
+        BookingBatchItem(action="update", booking_id=uuid4(), status="confirmed"),
+    ]
+    results = await repository.apply_batch(sample_user.user_id, items)
+
+    assert [error for _, error in results] == [None, "Tour not found", None, None, "Booking not found"]
+    assert results[0][0].status == "confirmed"
+    assert results[0][0].client_id == sample_user.user_id
+    assert results[2][0].status == "pending"
+    assert results[3][0].booking_id == existing.booking_id
+    assert results[3][0].status == "canceled"
+
+    created = await repository.get_booking_by_id(results[2][0].booking_id)
+    assert created is not None
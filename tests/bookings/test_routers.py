@@ -1,10 +1,15 @@
+import json
 import pytest
 from uuid import uuid4
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
 
 from src.bookings.models import Booking
+from src.config import DATABASE_TEST_ASYNC_URL
+from src.database import get_db, get_read_db
+from src.main import fastapi_app
 from src.bookings.repo import BookingRepository
 from src.tours.models import Tour
 from src.auth.models import User
@@ -23,6 +28,67 @@ async def test_get_all_bookings(client: AsyncClient, db_async_session: AsyncSess
     assert any(b["status"] == sample_booking.status for b in bookings)
 
 
+async def test_get_all_bookings_not_modified(client: AsyncClient, sample_booking: Booking, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = await client.get("/bookings/", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get("/bookings/", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+async def test_get_my_and_tour_bookings(client: AsyncClient, sample_booking: Booking, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = await client.get("/bookings/me", params={"limit": 1}, headers=headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 1
+    assert {item["client_id"] for item in page["items"]} == {str(sample_booking.client_id)}
+
+    response = await client.get(f"/bookings/tour/{sample_booking.tour_id}", headers=headers)
+    assert response.status_code == 200
+    assert str(sample_booking.booking_id) in {item["booking_id"] for item in response.json()["items"]}
+
+    response = await client.get("/bookings/me", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+
+async def test_get_booking_expanded(
+    client: AsyncClient, sample_booking: Booking, sample_tour: Tour, sample_user: User, jwt_token: str
+):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = await client.get(
+        f"/bookings/{sample_booking.booking_id}", params={"expand": "tour,client"}, headers=headers
+    )
+    assert response.status_code == 200
+    booking = response.json()
+    assert booking["tour"]["destination"] == sample_tour.destination
+    assert booking["client"] == {"user_id": str(sample_user.user_id), "user_name": sample_user.user_name}
+
+    response = await client.get(f"/bookings/{sample_booking.booking_id}", headers=headers)
+    assert "tour" not in response.json()
+    response = await client.get("/bookings/me", params={"expand": "tour"}, headers=headers)
+    assert all("tour" in item for item in response.json()["items"])
+    response = await client.get("/bookings/me", params={"expand": "hotel"}, headers=headers)
+    assert response.status_code == 422
+
+
+async def test_export_bookings(client: AsyncClient, sample_booking: Booking, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = await client.get("/bookings/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert str(sample_booking.booking_id) in {row["booking_id"] for row in rows}
+
+    response = await client.get("/bookings/export", params={"format": "csv"}, headers=headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="bookings.csv"'
+    lines = response.text.splitlines()
+    assert lines[0] == "booking_id,client_id,tour_id,status,seats,booking_date"
+    assert len(lines) == len(rows) + 1
+
+
 async def test_get_booking_by_id(client: AsyncClient, db_async_session: AsyncSession, sample_booking: Booking, jwt_token: str):
     response = await client.get(
         f"/bookings/{sample_booking.booking_id}",
@@ -64,6 +130,40 @@ async def test_update_booking(client: AsyncClient, sample_booking: Booking, jwt_
     assert updated_booking["status"] == "canceled"
 
 
+async def test_update_booking_invalidates_cache(client: AsyncClient, sample_booking: Booking, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = await client.get(f"/bookings/{sample_booking.booking_id}", headers=headers)
+    assert response.json()["status"] == sample_booking.status
+
+    await client.put(f"/bookings/{sample_booking.booking_id}", json={"status": "canceled"}, headers=headers)
+
+    response = await client.get(f"/bookings/{sample_booking.booking_id}", headers=headers)
+    assert response.json()["status"] == "canceled"
+
+
+async def test_apply_booking_batch(client: AsyncClient, sample_booking: Booking, sample_tour: Tour, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    await client.get(f"/bookings/{sample_booking.booking_id}", headers=headers)
+
+    items = [
+        {"action": "create", "tour_id": str(sample_tour.tour_id)},
+        {"action": "update", "booking_id": str(sample_booking.booking_id), "status": "pending"},
+        {"action": "cancel", "booking_id": str(uuid4())},
+    ]
+    response = await client.post("/bookings/batch", json={"items": items}, headers=headers)
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["booking"]["tour_id"] == str(sample_tour.tour_id)
+    assert results[1]["booking"]["status"] == "pending"
+    assert results[2] == {"error": "Booking not found"}
+
+    response = await client.get(f"/bookings/{sample_booking.booking_id}", headers=headers)
+    assert response.json()["status"] == "pending"
+
+    response = await client.post("/bookings/batch", json={"items": [{"action": "cancel"}]}, headers=headers)
+    assert response.status_code == 422
+
+
 async def test_delete_booking(client: AsyncClient, db_async_session: AsyncSession, sample_booking: Booking, jwt_token: str):
     response = await client.delete(
         f"/bookings/{sample_booking.booking_id}",
@@ -78,3 +178,23 @@ async def test_delete_booking(client: AsyncClient, db_async_session: AsyncSessio
     result = await db_async_session.execute(stmt)
     booking_in_db = result.scalar_one_or_none()
     assert booking_in_db is None
+
+
+async def test_create_booking_with_a_single_connection(client: AsyncClient, sample_tour: Tour, jwt_token: str):
+    # Resolving a new token must not hold a second connection while the route needs one
+    engine = create_async_engine(DATABASE_TEST_ASYNC_URL, pool_size=1, max_overflow=0, pool_timeout=1)
+    single_connection = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def get_single_connection_db():
+        async with single_connection() as session:
+            yield session
+
+    fastapi_app.dependency_overrides[get_db] = get_single_connection_db
+    fastapi_app.dependency_overrides[get_read_db] = get_single_connection_db
+    try:
+        response = await client.post(
+            "/bookings/", json={"tour_id": str(sample_tour.tour_id)}, headers={"Authorization": f"Bearer {jwt_token}"}
+        )
+    finally:
+        await engine.dispose()
+    assert response.status_code == 200
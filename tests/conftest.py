@@ -12,7 +12,7 @@ from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
 
 from src.main import fastapi_app
-from src.database import Base, get_db
+from src.database import Base, get_db, get_read_db
 from src.auth.models import User
 from src.bookings.models import Booking
 from src.tours.models import Tour
@@ -55,6 +55,7 @@ async def event_loop(request):
 @pytest.fixture(scope="function")
 async def client():
     fastapi_app.dependency_overrides[get_db] = test_get_db
+    fastapi_app.dependency_overrides[get_read_db] = test_get_db
     async with AsyncClient(app=fastapi_app, base_url="http://test") as client:
         yield client
     fastapi_app.dependency_overrides.clear()
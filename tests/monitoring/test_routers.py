@@ -0,0 +1,24 @@
+from httpx import AsyncClient
+
+
+async def test_get_hashing_stats(client: AsyncClient, jwt_token: str):
+    response = await client.get(
+        "/monitoring/hashing",
+        headers={"Authorization": f"Bearer {jwt_token}"}
+    )
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["max_pending"] > 0
+    assert "avg_queue_time_ms" in stats
+
+
+async def test_get_db_pool_stats(client: AsyncClient, jwt_token: str):
+    response = await client.get(
+        "/monitoring/db-pool",
+        headers={"Authorization": f"Bearer {jwt_token}"}
+    )
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["pool"] == "MonitoredPool"
+    assert stats["size"] > 0
+    assert "avg_wait_ms" in stats
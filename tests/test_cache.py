@@ -0,0 +1,237 @@
+import asyncio
+import brotli
+import json
+import time
+from email.utils import parsedate_to_datetime
+from uuid import uuid4
+
+import pytest
+from starlette.requests import Request
+
+from src.cache import (TTLCache, _dump_entry, _should_refresh, bump_generation, cached, get_generation,
+                       get_or_compute, listen_for_invalidations, publish_invalidation,
+                       register_invalidation_handler)
+from src.database import redis_client
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_pop_where():
+    cache = TTLCache(maxsize=10, ttl=60)
+    for key in range(4):
+        cache.set(key, key % 2)
+    cache.pop_where(lambda key, value: value == 1)
+    assert [cache.get(key) for key in range(4)] == [0, None, 0, None]
+
+
+async def test_invalidation_reaches_other_workers():
+    received = []
+    register_invalidation_handler("test_namespace", received.append)
+
+    listener = asyncio.create_task(listen_for_invalidations())
+    await asyncio.sleep(0.1)
+    # Published by "another worker": straight to the channel, bypassing the local dispatch
+    await redis_client.publish("cache_invalidation", "test_namespace:remote")
+    await publish_invalidation("test_namespace", "local")
+    await asyncio.sleep(0.1)
+    listener.cancel()
+
+    assert "remote" in received
+    assert "local" in received
+
+
+async def test_get_or_compute_single_flight():
+    key = f"test_{uuid4()}"
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b'{"calls": %d}' % calls
+
+    results = await asyncio.gather(*(get_or_compute(key, compute) for _ in range(10)))
+    assert calls == 1
+    assert all(result == b'{"calls": 1}' for result in results)
+    assert (await redis_client.get(key)).endswith('\n{"calls": 1}')
+
+
+async def test_get_or_compute_shares_errors_and_does_not_cache_them():
+    key = f"test_{uuid4()}"
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(get_or_compute(key, compute) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert await redis_client.get(key) is None
+
+
+async def test_get_or_compute_waits_for_cluster_lock_holder():
+    key = f"test_{uuid4()}"
+    await redis_client.set(f"lock:{key}", "other-worker", px=5000)
+
+    async def other_worker_fills():
+        await asyncio.sleep(0.1)
+        entry = {"value": b"from other worker", "delta": 0, "soft_expires_at": time.time() + 60}
+        await redis_client.set(key, _dump_entry(entry))
+
+    async def compute():
+        pytest.fail("should have waited for the lock holder")
+
+    filler = asyncio.create_task(other_worker_fills())
+    assert await get_or_compute(key, compute, cluster_lock=True) == b"from other worker"
+    await filler
+
+
+async def test_cached_decorator_and_generations():
+    family = f"test_family_{uuid4()}"
+    calls = []
+
+    @cached(key="test_item_{item_id}", family=family)
+    async def load(item_id: str, verbose: bool = False):
+        calls.append(item_id)
+        return {"item_id": item_id}
+
+    item_id = str(uuid4())
+    response = await load(item_id)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {"item_id": item_id}
+    assert (await load(item_id=item_id)).body == response.body
+    assert calls == [item_id]
+    assert await redis_client.exists(f"{family}:0:test_item_{item_id}")
+
+    assert await bump_generation(family) == 1
+    assert (await load(item_id)).body == response.body
+    assert calls == [item_id, item_id]
+    assert await redis_client.exists(f"{family}:1:test_item_{item_id}")
+
+
+async def test_get_or_compute_serves_stale_while_refreshing():
+    key = f"test_{uuid4()}"
+    stale = {"value": b"stale", "delta": 0, "soft_expires_at": time.time() - 1}
+    await redis_client.set(key, _dump_entry(stale), ex=60)
+    refreshed = asyncio.Event()
+
+    async def compute():
+        refreshed.set()
+        return b"fresh"
+
+    assert await get_or_compute(key, compute) == b"stale"
+    await asyncio.wait_for(refreshed.wait(), timeout=1)
+    await asyncio.sleep(0.05)
+    assert await get_or_compute(key, compute) == b"fresh"
+
+
+async def test_get_or_compute_refreshes_once_across_the_cluster():
+    key = f"test_{uuid4()}"
+    stale = {"value": b"stale", "delta": 0, "soft_expires_at": time.time() - 1}
+    await redis_client.set(key, _dump_entry(stale), ex=60)
+    await redis_client.set(f"lock:{key}", "other-worker", px=5000)
+
+    async def compute():
+        pytest.fail("another worker is already refreshing")
+
+    assert await get_or_compute(key, compute) == b"stale"
+    await asyncio.sleep(0.05)
+
+
+def test_early_refresh_grows_with_recompute_cost():
+    soon = time.time() + 5
+    assert not _should_refresh({"delta": 0, "soft_expires_at": soon})
+    # A recompute taking far longer than the remaining lifetime is refreshed ahead of time
+    assert sum(_should_refresh({"delta": 1000, "soft_expires_at": soon}) for _ in range(100)) > 90
+
+
+async def test_local_cache_serves_hits_without_redis():
+    key = f"test_{uuid4()}"
+
+    async def compute():
+        return b"value"
+
+    assert await get_or_compute(key, compute) == b"value"
+    await redis_client.delete(key)
+
+    async def must_not_compute():
+        pytest.fail("should have been served from the local cache")
+
+    assert await get_or_compute(key, must_not_compute) == b"value"
+
+
+async def test_local_cache_evicted_by_other_workers():
+    family = f"test_family_{uuid4()}"
+    listener = asyncio.create_task(listen_for_invalidations())
+    await asyncio.sleep(0.1)
+    assert await get_generation(family) == 0
+
+    # Another worker writes: our copy must go even though Redis was updated behind our back
+    await redis_client.incr(f"generation:{family}")
+    await redis_client.publish("cache_invalidation", f"cache_generation:{family}")
+    await asyncio.sleep(0.1)
+    listener.cancel()
+    assert await get_generation(family) == 1
+
+
+async def test_cached_serves_precompressed_variants():
+    family = f"test_family_{uuid4()}"
+    payload = {"items": ["Lisbon"] * 500}
+
+    @cached(key="test_large", family=family)
+    async def load():
+        return payload
+
+    identity = await load()
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["Vary"] == "Accept-Encoding"
+
+    request = Request({"type": "http", "headers": [(b"accept-encoding", b"gzip, br")]})
+    compressed = await load(_request=request)
+    assert compressed.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(compressed.body) == identity.body
+    assert compressed.headers["ETag"] != identity.headers["ETag"]
+
+
+async def test_cached_validators_change_with_the_body():
+    family = f"test_family_{uuid4()}"
+    payload = {"version": 1}
+
+    @cached(key="test_item", family=family)
+    async def load():
+        return payload
+
+    def conditional(**headers):
+        return Request({"type": "http", "headers": [(name.encode(), value.encode()) for name, value in headers.items()]})
+
+    first = await load()
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+    assert (await load(_request=conditional(**{"if-none-match": f"W/{etag}"}))).status_code == 304
+    assert (await load(_request=conditional(**{"if-modified-since": last_modified}))).status_code == 304
+
+    # Rendering the same body under a new generation is no modification
+    await bump_generation(family)
+    assert (await load()).headers["Last-Modified"] == last_modified
+
+    # A change within the same second still moves Last-Modified on
+    payload = {"version": 2}
+    await bump_generation(family)
+    changed = await load(_request=conditional(**{"if-modified-since": last_modified}))
+    assert changed.status_code == 200
+    assert parsedate_to_datetime(changed.headers["Last-Modified"]) > parsedate_to_datetime(last_modified)
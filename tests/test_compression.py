@@ -0,0 +1,100 @@
+import zlib
+
+import brotli
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient
+
+from src.compression import CompressionMiddleware, _StreamCompressor, negotiate_encoding
+
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+PAYLOAD = {"items": [{"destination": "Lisbon", "hotel": "Tivoli"}] * 50}
+
+
+@app.get("/large")
+async def large():
+    return PAYLOAD
+
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+
+@app.get("/stream")
+async def stream():
+    async def lines():
+        for _ in range(50):
+            yield b'{"destination": "Lisbon"}\n'
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/binary")
+async def binary():
+    return StreamingResponse(iter([b"\x00" * 1000]), media_type="application/octet-stream")
+
+
+@app.get("/stream-json")
+async def stream_json():
+    async def chunks():
+        for chunk in (b"[", b"1,2,3", b"]"):
+            yield chunk
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+
+async def test_compresses_large_responses_only():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "br"})
+        assert response.headers["content-encoding"] == "br"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.json() == PAYLOAD
+
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(response.content)
+
+        response = await client.get("/small", headers={"Accept-Encoding": "br"})
+        assert "content-encoding" not in response.headers
+
+        response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+
+async def test_compresses_streams_of_compressible_types():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/stream-json", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json() == [1, 2, 3]
+
+        response = await client.get("/stream", headers={"Accept-Encoding": "br"})
+        assert response.headers["content-encoding"] == "br"
+        assert response.text.count("Lisbon") == 50
+
+        response = await client.get("/binary", headers={"Accept-Encoding": "br"})
+        assert "content-encoding" not in response.headers
+
+
+def test_stream_compressor_flushes_as_it_goes():
+    line = b'{"destination": "Lisbon", "hotel": "Tivoli"}\n'
+    decompressors = {"gzip": zlib.decompressobj(zlib.MAX_WBITS | 16).decompress, "br": brotli.Decompressor().process}
+    for encoding, decompress in decompressors.items():
+        compressor = _StreamCompressor(encoding, flush_size=len(line) * 10)
+        received = b""
+        for _ in range(10):
+            received += decompress(compressor.compress(line))
+        # Everything sent so far can be decoded before the stream ends
+        assert received == line * 10
+        received += decompress(compressor.compress(line) + compressor.finish())
+        assert received == line * 11
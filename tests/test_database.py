@@ -0,0 +1,91 @@
+import asyncio
+import time
+from uuid import uuid4
+
+from jose import jwt
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from starlette.requests import Request
+
+from src import database
+from src.cache import cached
+from src.config import DATABASE_TEST_ASYNC_URL
+from src.database import ReplicaRouter, get_db, get_read_db
+
+from tests.conftest import async_test_engine, async_test_session
+
+
+def _request(subject: str) -> Request:
+    token = jwt.encode({"sub": subject}, "any key")
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+async def test_replicas_are_used_in_turn_while_caught_up():
+    first, second = create_async_engine(DATABASE_TEST_ASYNC_URL), create_async_engine(DATABASE_TEST_ASYNC_URL)
+    router = ReplicaRouter([first, second], max_lag=5, check_interval=60)
+    assert [await router.choose() for _ in range(3)] == [first, second, first]
+
+    router.max_lag = -1
+    assert await router.choose() is None
+
+
+async def test_unreachable_replica_is_skipped():
+    down = create_async_engine(make_url(DATABASE_TEST_ASYNC_URL).set(host="127.0.0.1", port=1))
+    up = create_async_engine(DATABASE_TEST_ASYNC_URL)
+    router = ReplicaRouter([down, up], max_lag=5, check_interval=60)
+    assert [await router.choose() for _ in range(2)] == [up, up]
+    assert router.stats()[0]["lag_s"] == float("inf")
+
+
+async def test_reads_stick_to_primary_after_own_write(monkeypatch):
+    replica = create_async_engine(DATABASE_TEST_ASYNC_URL)
+    monkeypatch.setattr(database, "replica_router", ReplicaRouter([replica], max_lag=5, check_interval=60))
+    monkeypatch.setattr(database, "async_session", async_test_session)
+    writer, other = _request(str(uuid4())), _request(str(uuid4()))
+
+    async def read_bind(request):
+        sessions = get_read_db(request)
+        session = await anext(sessions)
+        await sessions.aclose()
+        return session.bind
+
+    assert await read_bind(writer) is replica
+
+    sessions = get_db(writer)
+    session = await anext(sessions)
+    await session.execute(text("SELECT 1"))
+    await session.commit()
+    await sessions.aclose()
+
+    assert await read_bind(writer) is async_test_engine
+    assert await read_bind(other) is replica
+
+
+async def test_lag_check_gives_up_on_unresponsive_replica(monkeypatch):
+    router = ReplicaRouter([create_async_engine(DATABASE_TEST_ASYNC_URL)], max_lag=5, check_interval=60,
+                           check_timeout=0.05)
+
+    async def blackholed(index):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(router, "_query_lag", blackholed)
+    started_at = time.monotonic()
+    assert await router.choose() is None
+    assert time.monotonic() - started_at < 1
+    assert router.stats()[0]["lag_s"] == float("inf")
+
+
+async def test_cache_is_filled_from_primary(monkeypatch):
+    monkeypatch.setattr(database, "async_session", async_test_session)
+    replica = AsyncSession(create_async_engine(DATABASE_TEST_ASYNC_URL))
+    replica.info["replica"] = True
+    binds = []
+
+    @cached(key="test_item", family=f"test_family_{uuid4()}")
+    async def load(db: AsyncSession):
+        binds.append(db.bind)
+        return await db.scalar(text("SELECT 1"))
+
+    assert (await load(replica)).body == b"1"
+    assert binds == [async_test_engine]
+    await replica.close()
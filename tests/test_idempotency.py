@@ -0,0 +1,98 @@
+import asyncio
+from uuid import uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from src import idempotency
+from src.idempotency import idempotent
+from src.tours.models import Tour
+from src.tours.repo import TourRepository
+
+
+TOUR_DATA = {"destination": "Tallinn", "duration": 3, "cost": 450.00, "transport": "Ferry", "hotel": "Telegraaf"}
+
+
+async def _count_tours(db: AsyncSession, destination: str) -> int:
+    return await db.scalar(select(func.count()).select_from(Tour).where(Tour.destination == destination))
+
+
+async def test_retry_replays_the_first_response(client: AsyncClient, db_async_session: AsyncSession, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}", "Idempotency-Key": str(uuid4())}
+    tour_data = {**TOUR_DATA, "destination": "Tartu"}
+
+    first = await client.post("/tours/", json=tour_data, headers=headers)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    retry = await client.post("/tours/", json=tour_data, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert await _count_tours(db_async_session, "Tartu") == 1
+
+    # Without a key every request runs
+    await client.post("/tours/", json=tour_data, headers={"Authorization": headers["Authorization"]})
+    assert await _count_tours(db_async_session, "Tartu") == 2
+
+
+async def test_key_reused_for_another_request(client: AsyncClient, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}", "Idempotency-Key": str(uuid4())}
+    assert (await client.post("/tours/", json=TOUR_DATA, headers=headers)).status_code == 200
+
+    response = await client.post("/tours/", json={**TOUR_DATA, "duration": 4}, headers=headers)
+    assert response.status_code == 422
+    response = await client.post("/bookings/", json={"tour_id": str(uuid4())}, headers=headers)
+    assert response.status_code == 422
+
+
+async def test_concurrent_duplicates_run_once(client: AsyncClient, db_async_session: AsyncSession, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}", "Idempotency-Key": str(uuid4())}
+    tour_data = {**TOUR_DATA, "destination": "Parnu"}
+
+    responses = await asyncio.gather(*(client.post("/tours/", json=tour_data, headers=headers) for _ in range(5)))
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["tour_id"] for response in responses}) == 1
+    assert sum("idempotent-replayed" in response.headers for response in responses) == 4
+    assert await _count_tours(db_async_session, "Parnu") == 1
+
+
+async def test_client_errors_are_replayed(client: AsyncClient, db_async_session: AsyncSession, jwt_token: str):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 0})
+    headers = {"Authorization": f"Bearer {jwt_token}", "Idempotency-Key": str(uuid4())}
+    booking_data = {"tour_id": str(tour.tour_id)}
+
+    first = await client.post("/bookings/", json=booking_data, headers=headers)
+    assert first.status_code == 409
+    await TourRepository(db_async_session).update_tour(tour.tour_id, {"capacity": 5})
+    retry = await client.post("/bookings/", json=booking_data, headers=headers)
+    assert retry.status_code == 409
+    assert retry.json() == first.json()
+
+
+def _request(idempotency_key: str) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    headers = [(b"idempotency-key", idempotency_key.encode())]
+    return Request({"type": "http", "method": "POST", "path": "/test", "headers": headers}, receive)
+
+
+async def test_marker_outlives_its_ttl_while_the_handler_runs(monkeypatch):
+    monkeypatch.setattr(idempotency, "MARKER_TTL", 0.3)
+    calls = []
+
+    @idempotent
+    async def slow_handler():
+        calls.append(1)
+        await asyncio.sleep(1)
+        return {"calls": len(calls)}
+
+    idempotency_key = str(uuid4())
+    first = asyncio.create_task(slow_handler(_request=_request(idempotency_key)))
+    await asyncio.sleep(0.6)
+    retry = await slow_handler(_request=_request(idempotency_key))
+    assert await first == {"calls": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert calls == [1]
@@ -0,0 +1,52 @@
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.tours.facets import get_facet_counts, rebuild_facets
+from src.tours.models import Tour
+from src.tours.repo import TourRepository
+
+
+TOUR_DATA = {
+    "destination": "Oslo",
+    "duration": 10,
+    "cost": 2500.00,
+    "transport": "Ferry",
+    "hotel": "Thon",
+}
+
+
+async def test_facets_follow_writes(db_async_session: AsyncSession):
+    repository = TourRepository(db_async_session)
+    before = await get_facet_counts()
+
+    tour = await repository.create_tour(dict(TOUR_DATA))
+    after_create = await get_facet_counts()
+    assert after_create["transport"]["Ferry"] == before["transport"].get("Ferry", 0) + 1
+    assert after_create["duration"]["8-14"] == before["duration"].get("8-14", 0) + 1
+    assert after_create["cost"]["2000-5000"] == before["cost"].get("2000-5000", 0) + 1
+
+    await repository.update_tour(tour.tour_id, {"duration": 2, "cost": 300.00})
+    after_update = await get_facet_counts()
+    assert after_update["duration"].get("8-14", 0) == before["duration"].get("8-14", 0)
+    assert after_update["duration"]["1-3"] == before["duration"].get("1-3", 0) + 1
+    assert after_update["cost"]["0-500"] == before["cost"].get("0-500", 0) + 1
+
+    await repository.delete_tour(tour.tour_id)
+    assert await get_facet_counts() == before
+
+
+async def test_rebuild_facets(db_async_session: AsyncSession):
+    db_async_session.add(Tour(**TOUR_DATA))
+    await db_async_session.commit()
+
+    counts = await rebuild_facets(db_async_session)
+    assert counts["transport"]["Ferry"] >= 1
+    assert counts["cost"]["2000-5000"] >= 1
+    assert await get_facet_counts() == counts
+
+
+async def test_get_tour_facets(client: AsyncClient, db_async_session: AsyncSession, jwt_token: str):
+    await rebuild_facets(db_async_session)
+    response = await client.get("/tours/facets", headers={"Authorization": f"Bearer {jwt_token}"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"transport", "duration", "cost"}
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import bump_generation
+from src.tours import routers
+from src.tours.fast_repo import TourFastRepository
+from src.tours.models import Tour
+from src.tours.repo import TourRepository
+from src.tours.routers import serialize_tour
+
+
+async def test_matches_tour_repository(db_async_session: AsyncSession):
+    created_at = datetime(2026, 3, 1, 12, 0, 0, 250000)
+    tours = [
+        Tour(destination="Stavanger", duration=2 + index, cost=300.5 + index, transport="Ferry", hotel="Atlantic",
+             capacity=index or None, created_at=created_at + timedelta(minutes=index // 2))
+        for index in range(5)
+    ]
+    db_async_session.add_all(tours)
+    await db_async_session.commit()
+    orm, fast = TourRepository(db_async_session), TourFastRepository(db_async_session)
+
+    assert await fast.get_tour_by_id(tours[1].tour_id) == serialize_tour(await orm.get_tour_by_id(tours[1].tour_id))
+    assert await fast.get_tour_by_id(tours[1].tour_id.__class__(int=0)) is None
+
+    filters = {"destination": "Stavanger", "transport": "Ferry", "min_duration": 3, "max_cost": 304.0}
+    after = None
+    while True:
+        orm_page, orm_more = await orm.get_tours_page(limit=2, after=after, **filters)
+        fast_page, fast_more = await fast.get_tours_page(limit=2, after=after, **filters)
+        assert fast_page == [serialize_tour(tour) for tour in orm_page]
+        assert fast_more == orm_more
+        if not orm_more:
+            break
+        after = (orm_page[-1].created_at, orm_page[-1].tour_id)
+
+
+async def test_routes_use_fast_path(client: AsyncClient, sample_tour: Tour, jwt_token: str, monkeypatch):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    expected = (await client.get(f"/tours/{sample_tour.tour_id}", headers=headers)).json()
+    page = (await client.get("/tours/", params={"limit": 1}, headers=headers)).json()
+
+    monkeypatch.setattr(routers, "FAST_READ_PATH", True)
+    await bump_generation("tours")
+    response = await client.get(f"/tours/{sample_tour.tour_id}", headers=headers)
+    assert response.json() == expected
+    fast_page = (await client.get("/tours/", params={"limit": 2}, headers=headers)).json()
+    assert fast_page["items"][0] == page["items"][0]
+    next_page = (await client.get("/tours/", params={"limit": 1, "cursor": page["next_cursor"]}, headers=headers))
+    assert next_page.json()["items"][0] == fast_page["items"][1]
@@ -0,0 +1,63 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.tours.facets import get_facet_counts
+from src.tours.importer import import_tours, iter_lines
+from src.tours.models import Tour
+
+
+async def _chunks(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def test_iter_lines_across_chunks():
+    data = "first\r\nsecond, ünïcode\nlast".encode("utf-8")
+    assert [line async for line in iter_lines(_chunks(data, size=3))] == ["first", "second, ünïcode", "last"]
+
+
+async def test_import_ndjson_reports_bad_rows(db_async_session: AsyncSession):
+    before = await get_facet_counts()
+    data = b"\n".join([
+        b'{"destination": "Bergen", "duration": 5, "cost": 800, "transport": "Ferry", "hotel": "Bryggen"}',
+        b'{"destination": "Bergen", "duration": 0, "cost": 800, "transport": "Ferry", "hotel": "Bryggen"}',
+        b'not json',
+        b'{"destination": "Bergen", "duration": 6, "cost": 900, "transport": "Ferry", "hotel": "Bryggen"}',
+    ])
+    progress = []
+
+    report = await import_tours(db_async_session, _chunks(data), "ndjson", batch_size=1, on_progress=progress.append)
+    assert report["imported"] == 2
+    assert report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert "duration" in report["errors"][0]["error"]
+    assert len(progress) == 2
+
+    count = await db_async_session.scalar(select(func.count()).where(Tour.destination == "Bergen"))
+    assert count == 2
+    after = await get_facet_counts()
+    assert after["transport"]["Ferry"] == before["transport"].get("Ferry", 0) + 2
+
+
+async def test_import_csv(db_async_session: AsyncSession):
+    data = (
+        'destination,duration,cost,transport,hotel,description\n'
+        'Tromso,4,1500,Plane,Clarion,"Northern lights,\nand whales"\n'
+        'Tromso,4,1500,Plane\n'
+    ).encode("utf-8")
+
+    report = await import_tours(db_async_session, _chunks(data), "csv")
+    assert report["imported"] == 1
+    assert report["errors"] == [{"row": 2, "error": "expected 6 fields, got 4"}]
+
+    tour = (await db_async_session.execute(select(Tour).where(Tour.destination == "Tromso"))).scalar_one()
+    assert tour.description == "Northern lights,\nand whales"
+    assert tour.created_at is not None
+
+
+async def test_import_csv_with_byte_order_mark(db_async_session: AsyncSession):
+    data = "\ufeffdestination,duration,cost,transport,hotel\nReykjavik,3,1200,Plane,Borg\n".encode("utf-8")
+
+    report = await import_tours(db_async_session, _chunks(data, size=2), "csv")
+    assert report["imported"] == 1
+    assert report["failed"] == 0
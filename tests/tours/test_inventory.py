@@ -0,0 +1,140 @@
+import asyncio
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import User
+from src.bookings.models import Booking
+from src.bookings.repo import BookingRepository
+from src.bookings.schemas import BookingBatchItem
+from src.exceptions import BadRequestException, NotEnoughSeatsException
+from src.tours.inventory import get_availability, seat_changes
+from src.tours.repo import TourRepository
+
+from tests.conftest import async_test_session
+
+
+TOUR_DATA = {"destination": "Kyoto", "duration": 6, "cost": 1800.00, "transport": "Train", "hotel": "Ryokan"}
+
+
+def test_seat_changes():
+    a, b = uuid4(), uuid4()
+    assert seat_changes({a: 2}, {a: 3}) == {a: 1}
+    assert seat_changes({a: 2}, {b: 2}) == {a: -2, b: 2}
+    assert seat_changes({a: 2}, {}) == {a: -2}
+    assert seat_changes({a: 2}, {a: 2}) == {}
+
+
+async def test_bookings_never_oversell(db_async_session: AsyncSession, sample_user: User):
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 5})
+
+    async def book():
+        async with async_test_session() as session:
+            try:
+                await BookingRepository(session).create_booking(
+                    {"client_id": sample_user.user_id, "tour_id": tour.tour_id}
+                )
+                return True
+            except NotEnoughSeatsException:
+                return False
+
+    results = await asyncio.gather(*(book() for _ in range(20)))
+    assert results.count(True) == 5
+    assert await get_availability(db_async_session, tour.tour_id) == (5, 0)
+    booked = await db_async_session.scalar(select(func.count()).where(Booking.tour_id == tour.tour_id))
+    assert booked == 5
+
+
+async def test_cancel_and_delete_give_seats_back(db_async_session: AsyncSession, sample_user: User):
+    user_id = sample_user.user_id
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 3})
+    repository = BookingRepository(db_async_session)
+    tour_id = tour.tour_id
+    booking = await repository.create_booking({"client_id": user_id, "tour_id": tour_id, "seats": 2})
+    booking_id = booking.booking_id
+    with pytest.raises(NotEnoughSeatsException):
+        await repository.create_booking({"client_id": user_id, "tour_id": tour_id, "seats": 2})
+
+    await repository.update_booking(booking_id, {"status": "canceled"})
+    assert await get_availability(db_async_session, tour_id) == (3, 3)
+    await repository.update_booking(booking_id, {"status": "confirmed", "seats": 3})
+    assert await get_availability(db_async_session, tour_id) == (3, 0)
+    await repository.delete_booking(booking_id)
+    assert await get_availability(db_async_session, tour_id) == (3, 3)
+
+
+async def test_concurrent_cancels_give_seats_back_once(db_async_session: AsyncSession, sample_user: User):
+    user_id = sample_user.user_id
+    tour = await TourRepository(db_async_session).create_tour({**TOUR_DATA, "capacity": 2})
+    tour_id = tour.tour_id
+
+    async def book() -> UUID:
+        booking = await BookingRepository(db_async_session).create_booking(
+            {"client_id": user_id, "tour_id": tour_id, "seats": 2}
+        )
+        return booking.booking_id
+
+    async def race(change):
+        async def run():
+            async with async_test_session() as session:
+                await change(BookingRepository(session))
+
+        await asyncio.gather(*(run() for _ in range(5)))
+        assert await get_availability(db_async_session, tour_id) == (2, 2)
+
+    booking_id = await book()
+    await race(lambda repository: repository.update_booking(booking_id, {"status": "canceled"}))
+    booking_id = await book()
+    await race(lambda repository: repository.delete_booking(booking_id))
+    booking_id = await book()
+    await race(lambda repository: repository.apply_batch(user_id, [
+        BookingBatchItem(action="cancel", booking_id=booking_id)
+    ]))
+
+
+async def test_capacity_change_recounts_seats(db_async_session: AsyncSession, sample_user: User):
+    tours = TourRepository(db_async_session)
+    tour = await tours.create_tour(dict(TOUR_DATA))
+    await BookingRepository(db_async_session).create_booking(
+        {"client_id": sample_user.user_id, "tour_id": tour.tour_id, "seats": 4}
+    )
+    assert await get_availability(db_async_session, tour.tour_id) == (None, None)
+
+    await tours.update_tour(tour.tour_id, {"capacity": 10})
+    assert await get_availability(db_async_session, tour.tour_id) == (10, 6)
+
+
+async def test_capacity_change_keeps_other_changes(db_async_session: AsyncSession, sample_user: User):
+    tours = TourRepository(db_async_session)
+    tour = await tours.create_tour({**TOUR_DATA, "capacity": 5})
+    tour_id = tour.tour_id
+    await BookingRepository(db_async_session).create_booking(
+        {"client_id": sample_user.user_id, "tour_id": tour_id, "seats": 3}
+    )
+
+    updated = await tours.update_tour(tour_id, {"destination": "Nara", "cost": 99.0, "capacity": 10})
+    assert (updated.destination, updated.cost, updated.capacity, updated.seats_left) == ("Nara", 99.0, 10, 7)
+    db_async_session.expire_all()
+    stored = await tours.get_tour_by_id(tour_id)
+    assert (stored.destination, stored.cost, stored.seats_left) == ("Nara", 99.0, 7)
+
+    with pytest.raises(BadRequestException):
+        await tours.update_tour(tour_id, {"destination": "Osaka", "capacity": 2})
+    assert await get_availability(db_async_session, tour_id) == (10, 7)
+
+
+async def test_batch_refuses_items_beyond_capacity(db_async_session: AsyncSession, sample_user: User):
+    tours = TourRepository(db_async_session)
+    full = await tours.create_tour({**TOUR_DATA, "capacity": 1})
+    roomy = await tours.create_tour({**TOUR_DATA, "capacity": 10})
+
+    results = await BookingRepository(db_async_session).apply_batch(sample_user.user_id, [
+        BookingBatchItem(action="create", tour_id=full.tour_id, seats=2),
+        BookingBatchItem(action="create", tour_id=roomy.tour_id, seats=2),
+        BookingBatchItem(action="create", tour_id=full.tour_id),
+    ])
+    assert [error for _, error in results] == ["Not enough seats left on this tour", None, None]
+    assert await get_availability(db_async_session, full.tour_id) == (1, 0)
+    assert await get_availability(db_async_session, roomy.tour_id) == (10, 8)
@@ -1,5 +1,7 @@
 import pytest
 from uuid import uuid4
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -33,6 +35,54 @@ async def test_get_all_tours(db_async_session: AsyncSession, sample_tour_data):
     assert any(t.destination == sample_tour_data["destination"] for t in tours)
 
 
+async def test_get_tours_page(db_async_session: AsyncSession, sample_tour_data):
+    repository = TourRepository(db_async_session)
+
+    for _ in range(3):
+        db_async_session.add(Tour(**{**sample_tour_data, "destination": "Lisbon"}))
+    await db_async_session.commit()
+
+    first_page, has_more = await repository.get_tours_page(limit=2, destination="Lisbon")
+    assert len(first_page) == 2
+    assert has_more is True
+
+    last = first_page[-1]
+    rest, _ = await repository.get_tours_page(limit=100, after=(last.created_at, last.tour_id), destination="Lisbon")
+    assert {t.tour_id for t in first_page}.isdisjoint(t.tour_id for t in rest)
+    assert all(t.destination == "Lisbon" for t in first_page + rest)
+
+
+async def test_search_tours(db_async_session: AsyncSession, sample_tour_data):
+    repository = TourRepository(db_async_session)
+
+    tour = Tour(**{**sample_tour_data, "destination": "Reykjavik", "description": "Northern lights and geysers"})
+    db_async_session.add(tour)
+    await db_async_session.commit()
+
+    tours, fuzzy = await repository.search_tours("geysers reykjavik", limit=10)
+    assert fuzzy is False
+    assert tours[0].tour_id == tour.tour_id
+
+
+async def test_search_tours_falls_back_to_trigrams(db_async_session: AsyncSession, sample_tour_data):
+    # The extension comes with the migrations, not with create_all
+    try:
+        await db_async_session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await db_async_session.commit()
+    except DBAPIError:
+        await db_async_session.rollback()
+        pytest.skip("pg_trgm is not available on the test database server")
+    repository = TourRepository(db_async_session)
+
+    tour = Tour(**{**sample_tour_data, "destination": "Lisbon", "description": "Trams and pastries"})
+    db_async_session.add(tour)
+    await db_async_session.commit()
+
+    tours, fuzzy = await repository.search_tours("Lisbn", limit=100)
+    assert fuzzy is True
+    assert tour.tour_id in {t.tour_id for t in tours}
+
+
 async def test_get_tour_by_id(db_async_session: AsyncSession, sample_tour_data):
     repository = TourRepository(db_async_session)
 
@@ -100,3 +150,14 @@ async def test_delete_tour(db_async_session: AsyncSession, sample_tour_data):
     result = await db_async_session.execute(stmt)
     tour_in_db = result.scalar_one_or_none()
     assert tour_in_db is None
+
+
+async def test_stream_tours(db_async_session: AsyncSession, sample_tour_data):
+    repository = TourRepository(db_async_session)
+    for _ in range(3):
+        db_async_session.add(Tour(**sample_tour_data))
+    await db_async_session.commit()
+
+    batches = [batch async for batch in repository.stream_tours(fetch_size=2)]
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sum(len(batch) for batch in batches) == len(await repository.get_all_tours())
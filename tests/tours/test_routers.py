@@ -14,11 +14,76 @@ async def test_get_all_tours(client: AsyncClient, db_async_session: AsyncSession
         headers={"Authorization": f"Bearer {jwt_token}"}
     )
     assert response.status_code == 200
-    tours = response.json()
+    tours = response.json()["items"]
     assert len(tours) > 0
     assert any(t["destination"] == sample_tour.destination for t in tours)
 
 
+@pytest.mark.asyncio
+async def test_get_all_tours_paginated(client: AsyncClient, sample_tour: Tour, jwt_token: str):
+    for destination in ("Rome", "Rome"):
+        await client.post(
+            "/tours/",
+            json={"destination": destination, "duration": 3, "cost": 400.00, "transport": "Bus", "hotel": "Roma"},
+            headers={"Authorization": f"Bearer {jwt_token}"}
+        )
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 1, "destination": "Rome"}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/tours/", params=params, headers={"Authorization": f"Bearer {jwt_token}"})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 1
+        seen.extend(t["tour_id"] for t in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) >= 2
+    assert len(seen) == len(set(seen))
+
+
+@pytest.mark.asyncio
+async def test_get_all_tours_filtered(client: AsyncClient, sample_tour: Tour, jwt_token: str):
+    response = await client.get(
+        "/tours/",
+        params={"transport": sample_tour.transport, "min_cost": sample_tour.cost, "max_duration": sample_tour.duration},
+        headers={"Authorization": f"Bearer {jwt_token}"}
+    )
+    assert response.status_code == 200
+    tours = response.json()["items"]
+    assert any(t["tour_id"] == str(sample_tour.tour_id) for t in tours)
+    assert all(t["transport"] == sample_tour.transport for t in tours)
+
+
+@pytest.mark.asyncio
+async def test_get_all_tours_bad_cursor(client: AsyncClient, jwt_token: str):
+    response = await client.get(
+        "/tours/",
+        params={"cursor": "not-a-cursor"},
+        headers={"Authorization": f"Bearer {jwt_token}"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_tours(client: AsyncClient, sample_tour: Tour, jwt_token: str):
+    response = await client.get(
+        "/tours/search",
+        params={"q": sample_tour.hotel, "limit": 1},
+        headers={"Authorization": f"Bearer {jwt_token}"}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["fuzzy"] is False
+    assert len(result["items"]) == 1
+    assert result["items"][0]["hotel"] == sample_tour.hotel
+
+
 @pytest.mark.asyncio
 async def test_get_tour_by_id(client: AsyncClient, db_async_session: AsyncSession, sample_tour: Tour, jwt_token: str):
     response = await client.get(
@@ -31,6 +96,26 @@ async def test_get_tour_by_id(client: AsyncClient, db_async_session: AsyncSessio
     assert retrieved_tour["destination"] == sample_tour.destination
 
 
+@pytest.mark.asyncio
+async def test_get_tour_by_id_conditional(client: AsyncClient, sample_tour: Tour, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    response = await client.get(f"/tours/{sample_tour.tour_id}", headers=headers)
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    response = await client.get(f"/tours/{sample_tour.tour_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = await client.get(f"/tours/{sample_tour.tour_id}", headers={**headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    await client.put(f"/tours/{sample_tour.tour_id}", json={"cost": 999.00}, headers=headers)
+    response = await client.get(f"/tours/{sample_tour.tour_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
 @pytest.mark.asyncio
 async def test_create_tour(client: AsyncClient, jwt_token: str):
     tour_data = {
@@ -52,6 +137,21 @@ async def test_create_tour(client: AsyncClient, jwt_token: str):
     assert created_tour["destination"] == "London"
 
 
+@pytest.mark.asyncio
+async def test_import_tours(client: AsyncClient, jwt_token: str):
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+    data = "destination,duration,cost,transport,hotel\nAkureyri,3,1100,Plane,Borg\nAkureyri,x,1100,Plane,Borg\n"
+
+    response = await client.post("/tours/import", content=data, headers={**headers, "Content-Type": "text/csv"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 1
+    assert report["failed"] == 1
+
+    response = await client.get("/tours/", params={"destination": "Akureyri"}, headers=headers)
+    assert len(response.json()["items"]) == 1
+
+
 @pytest.mark.asyncio
 async def test_update_tour(client: AsyncClient, sample_tour: Tour, jwt_token: str):
     update_data = {"destination": "New York", "cost": 1500.00}